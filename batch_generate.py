@@ -0,0 +1,216 @@
+"""
+batch_generate.py
+
+Generates tailored resumes and cover letters for many jobs and profiles at
+once. Documents are produced with generate_resume_and_cover_letter on worker
+threads, with a limit on how many run at the same time, a token bucket
+limiting how fast requests reach the model API, and retries with
+exponential backoff. Every task's status is stored in the generation_tasks
+table, so an interrupted batch picks up where it stopped when it is run
+again with the same batch ID.
+
+Run with: python batch_generate.py my-batch --profile "Joey P" --jobs-file shortlist.txt
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+
+from db_connection import get_connection
+from json_database import DB_NAME, get_job_for_generation, load_user_profile
+from main import (
+    PdfRenderer, ProcessPoolRenderer, generate_resume_and_cover_letter, get_model, set_pdf_renderer
+)
+
+DOC_TYPES = ("resume", "cover_letter")
+BATCH_OUTPUT_DIR = os.path.join("generated_pdfs", "batches")
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """Allows rate requests per second on average, with bursts of up to capacity."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def create_generation_tasks_table(db_name=DB_NAME):
+    """Creates the table that tracks batch generation progress."""
+    conn = get_connection(db_name)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS generation_tasks (
+            batch_id TEXT,
+            profile_name TEXT,
+            job_id TEXT,
+            doc_type TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            pdf_path TEXT,
+            error TEXT,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (batch_id, profile_name, job_id, doc_type)
+        )
+        """
+    )
+    conn.commit()
+
+
+def _update_task(db_name, task, **fields):
+    """Writes new values for one task's progress columns."""
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    conn = get_connection(db_name)
+    conn.execute(
+        f"""
+        UPDATE generation_tasks SET {assignments}, updated_at = CURRENT_TIMESTAMP
+        WHERE batch_id = ? AND profile_name = ? AND job_id = ? AND doc_type = ?
+        """,
+        (*fields.values(), *task),
+    )
+    conn.commit()
+
+
+def output_path(batch_id, profile_name, job_id, doc_type):
+    """PDF path for one document of a batch, safe for any job ID."""
+    def safe(text):
+        return re.sub(r"[^\w.-]+", "_", str(text))
+    return os.path.join(BATCH_OUTPUT_DIR, safe(batch_id),
+                        f"{safe(profile_name)}_{safe(job_id)}_{doc_type}.pdf")
+
+
+def queue_tasks(batch_id, profile_names, job_ids, doc_types=DOC_TYPES, db_name=DB_NAME):
+    """
+    Records every profile/job/document combination of a batch, keeping existing progress.
+    :return: The tasks that are not done yet as (batch_id, profile, job_id, doc_type) tuples.
+    """
+    create_generation_tasks_table(db_name)
+    conn = get_connection(db_name)
+    conn.executemany(
+        "INSERT OR IGNORE INTO generation_tasks (batch_id, profile_name, job_id, doc_type) "
+        "VALUES (?, ?, ?, ?)",
+        [(batch_id, profile, job_id, doc_type)
+         for profile in profile_names for job_id in job_ids for doc_type in doc_types],
+    )
+    conn.commit()
+    return conn.execute(
+        "SELECT batch_id, profile_name, job_id, doc_type FROM generation_tasks "
+        "WHERE batch_id = ? AND status != 'done'",
+        (batch_id,),
+    ).fetchall()
+
+
+async def _run_task(task, settings, bucket, semaphore, db_name):  # pylint: disable=too-many-locals
+    """Generates one document, retrying with exponential backoff. Returns its final status."""
+    batch_id, profile_name, job_id, doc_type = task
+    user_data = load_user_profile(profile_name, db_name)
+    job_data = get_job_for_generation(job_id, db_name)
+    if user_data is None or job_data is None:
+        missing = "profile" if user_data is None else "job"
+        _update_task(db_name, task, status="failed", error=f"Unknown {missing}")
+        return "failed"
+
+    path = output_path(batch_id, profile_name, job_id, doc_type)
+    error = None
+    for attempt in range(1, settings["max_attempts"] + 1):
+        async with semaphore:
+            await bucket.acquire()
+            _update_task(db_name, task, status="running", attempts=attempt)
+            try:
+                pdf_path = await asyncio.to_thread(
+                    generate_resume_and_cover_letter, user_data, job_data, doc_type,
+                    output_path=path,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = f"{type(e).__name__}: {e}"
+            else:
+                _update_task(db_name, task, status="done", pdf_path=pdf_path, error=None)
+                return "done"
+        if attempt < settings["max_attempts"]:
+            # Back off outside the semaphore so other tasks keep going meanwhile
+            delay = settings["backoff"] * 2 ** (attempt - 1)
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+    _update_task(db_name, task, status="failed", error=error)
+    return "failed"
+
+
+async def run_batch(batch_id, profile_names, job_ids, doc_types=DOC_TYPES, db_name=DB_NAME,
+                    **settings):
+    """
+    Generates every document of a batch, resuming a batch that was interrupted.
+    :param settings: concurrency (documents at once, default 4), rate (model requests
+                     per second, default 1), burst (default 1), max_attempts (default 3)
+                     and backoff (seconds before the first retry, default 1).
+    :return: Dictionary counting done and failed tasks from this run.
+    """
+    settings = {"concurrency": 4, "rate": 1.0, "burst": 1, "max_attempts": 3, "backoff": 1.0,
+                **settings}
+    tasks = queue_tasks(batch_id, profile_names, job_ids, doc_types, db_name)
+    if not tasks:
+        return {"done": 0, "failed": 0}
+
+    await asyncio.to_thread(get_model)  # Set up the client once before the workers start
+    bucket = TokenBucket(settings["rate"], settings["burst"])
+    semaphore = asyncio.Semaphore(settings["concurrency"])
+    statuses = await asyncio.gather(*(_run_task(task, settings, bucket, semaphore, db_name)
+                                      for task in tasks))
+    return {"done": statuses.count("done"), "failed": statuses.count("failed")}
+
+
+def batch_progress(batch_id, db_name=DB_NAME):
+    """Counts a batch's tasks by status."""
+    create_generation_tasks_table(db_name)
+    rows = get_connection(db_name).execute(
+        "SELECT status, COUNT(*) FROM generation_tasks WHERE batch_id = ? GROUP BY status",
+        (batch_id,),
+    ).fetchall()
+    return dict(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate documents for many jobs at once.")
+    parser.add_argument("batch_id", help="name of the batch, reuse it to resume")
+    parser.add_argument("--profile", action="append", required=True,
+                        help="profile name, can be repeated")
+    parser.add_argument("--job", action="append", default=[], help="job ID, can be repeated")
+    parser.add_argument("--jobs-file", help="file with one job ID per line")
+    parser.add_argument("--doc-type", action="append", choices=DOC_TYPES,
+                        help="document type, both by default")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="model requests per second")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--render-processes", type=int, default=0,
+                        help="render PDFs in this many worker processes")
+    args = parser.parse_args()
+
+    batch_job_ids = list(args.job)
+    if args.jobs_file:
+        with open(args.jobs_file, "r", encoding="utf-8") as f:
+            batch_job_ids += [line.strip() for line in f if line.strip()]
+
+    if args.render_processes:
+        set_pdf_renderer(ProcessPoolRenderer(args.render_processes))
+    result = asyncio.run(run_batch(
+        args.batch_id, args.profile, batch_job_ids, tuple(args.doc_type or DOC_TYPES), args.db,
+        concurrency=args.concurrency, rate=args.rate, max_attempts=args.max_attempts,
+    ))
+    set_pdf_renderer(PdfRenderer()).close()
+    print(f"this run: {result}, batch so far: {batch_progress(args.batch_id, args.db)}")
@@ -0,0 +1,595 @@
+"""
+benchmarks.py
+
+Benchmarks for the job database. Generates synthetic feeds shaped like
+rapid_jobs2.json and times:
+- import: the per-row import against the batched bulk import.
+- reimport: re-importing a feed where 1% of jobs changed, with the bulk
+  import against the incremental import.
+- dedup: hashing and clustering jobs for duplicate detection, first run
+  and a re-run with nothing changed.
+- rank: building the profile ranking index, updating it after 1% of jobs
+  changed, and the latency of top-k queries.
+- job-list: loading every job for the GUI table against loading one page.
+- generation: time-to-first-token and total latency of blocking and streamed
+  generation against the fake model server in fake_model.py.
+- render: PDF pages per second for resumes and cover letters of different
+  lengths, in the calling thread and in a render process pool.
+- suite: the regression suite. It runs fully offline and is seeded, so runs
+  are comparable. For both feed formats at each scale it measures import and
+  re-import throughput and get_jobs, get_jobs_page and get_job_info latency.
+  It also times end-to-end generation to PDF against the fake model. Results
+  are compared with the stored baseline file, and the run fails when a
+  number is worse than the baseline by more than the tolerance.
+  --save-baseline stores the results as the new baseline. Baselines only
+  compare runs on the same machine, so none ships with the repository: run
+  the suite with --save-baseline once on the machine that will run it, which
+  writes benchmark_baseline.json in the working directory. Until then the
+  suite fails rather than passing with nothing checked.
+
+Run with: python benchmarks.py import --jobs 20000
+          python benchmarks.py suite --scales 1k,100k,1m --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import main
+import metrics
+from db_connection import close_connection
+from document_cache import DocumentCache
+from job_dedup import find_duplicates
+from job_ranking import rank_jobs, update_index
+from fake_model import FakeModelServer
+from json_database import (
+    PAGE_SIZE, bulk_import_json_data, create_database, get_job_info, get_jobs, get_jobs_page,
+    import_json_data, incremental_import_json_data
+)
+
+TITLES = [
+    "Software Engineer", "Data Analyst", "Backend Developer", "QA Engineer", "DevOps Engineer",
+]
+COMPANIES = ["TechCorp", "WEX", "Initech", "Globex", "Hooli", "Umbrella"]
+LOCATIONS = ["Boston, MA", "Remote", "Austin, TX", "New York, NY", "Seattle, WA"]
+SALARY_RANGES = ["", "", "120K–130K a year", "45–50 an hour", "97,750–132,250 a year"]
+INTERVALS = ["yearly", "hourly", "monthly", None]
+WORDS = ("python sql cloud team build design test deploy customers data platform "
+         "services scale reliable secure agile review mentor api systems").split()
+
+
+def synthetic_rapid_job(index, rng, description_words=300):
+    """Builds one fake job in the rapid_jobs2.json format."""
+    return {
+        "id": f"synthetic-{index}",
+        "title": rng.choice(TITLES),
+        "company": rng.choice(COMPANIES),
+        "description": " ".join(rng.choice(WORDS) for _ in range(description_words)),
+        "image": "",
+        "location": rng.choice(LOCATIONS),
+        "employmentType": "Full-time",
+        "datePosted": "",
+        "salaryRange": rng.choice(SALARY_RANGES),
+        "jobProviders": [{"jobProvider": "Synthetic", "url": f"https://example.com/{index}"}],
+    }
+
+
+def synthetic_results_job(index, rng, description_words=300):
+    """Builds one fake job in the rapidResults.json format."""
+    interval = rng.choice(INTERVALS)
+    low = {"yearly": 90000, "hourly": 40, "monthly": 7000}.get(interval)
+    return {
+        "id": f"results-{index}",
+        "site": "synthetic",
+        "job_url": f"https://example.com/results/{index}",
+        "title": rng.choice(TITLES),
+        "company": rng.choice(COMPANIES),
+        "location": rng.choice(LOCATIONS),
+        "job_type": "fulltime",
+        "date_posted": "2025-01-15",
+        "interval": interval,
+        "min_amount": low,
+        "max_amount": low and low * 1.2,
+        "currency": low and "USD",
+        "is_remote": rng.random() < 0.3,
+        "emails": [f"jobs{index % 50}@example.com"] if rng.random() < 0.2 else None,
+        "description": " ".join(rng.choice(WORDS) for _ in range(description_words)),
+    }
+
+
+def write_synthetic_feed(file_path, job_count, jobs_per_line=10, seed=0,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                         feed_format="file1", description_words=300):
+    """
+    Writes job_count fake jobs. The file1 format is written as JSON arrays, one
+    array per line like rapid_jobs2.json, and file2 as one rapidResults object per line.
+    """
+    rng = random.Random(seed)
+    with open(file_path, "w", encoding="utf-8") as f:
+        if feed_format == "file2":
+            f.writelines(json.dumps(synthetic_results_job(i, rng, description_words)) + "\n"
+                         for i in range(job_count))
+            return
+        for start in range(0, job_count, jobs_per_line):
+            stop = min(start + jobs_per_line, job_count)
+            f.write(json.dumps([synthetic_rapid_job(i, rng, description_words)
+                                for i in range(start, stop)]))
+            f.write("\n")
+
+
+def time_import(import_function, feed_path, **kwargs):
+    """Imports feed_path into a fresh database and returns the elapsed seconds."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        create_database(db_path)
+        start = time.perf_counter()
+        import_function(feed_path, "file1", db_path, **kwargs)
+        elapsed = time.perf_counter() - start
+        close_connection(db_path)
+        return elapsed
+
+
+def bench_import(job_count, batch_size):
+    """Compares the per-row import path with the bulk import path."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feed_path = os.path.join(tmp_dir, "feed.json")
+        write_synthetic_feed(feed_path, job_count)
+
+        per_row = time_import(import_json_data, feed_path)
+        bulk = time_import(bulk_import_json_data, feed_path, batch_size=batch_size)
+
+    print(f"jobs: {job_count}")
+    print(f"per-row import: {per_row:.2f}s ({job_count / per_row:,.0f} jobs/s)")
+    print(f"bulk import:    {bulk:.2f}s ({job_count / bulk:,.0f} jobs/s)")
+    print(f"speedup:        {per_row / bulk:.1f}x")
+
+
+def bench_reimport(job_count, batch_size):
+    """Times re-importing a mostly unchanged feed with the bulk and incremental imports."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feed_path = os.path.join(tmp_dir, "feed.json")
+        db_path = os.path.join(tmp_dir, "bench.db")
+        write_synthetic_feed(feed_path, job_count)
+        create_database(db_path)
+        first = incremental_import_json_data(feed_path, "file1", db_path, batch_size)
+
+        # Tomorrow's feed: 1% of postings edited, so the rest are unchanged
+        edited_path = os.path.join(tmp_dir, "edited.json")
+        with open(feed_path, "r", encoding="utf-8") as src, \
+                open(edited_path, "w", encoding="utf-8") as dst:
+            for line_number, line in enumerate(src):
+                if line_number % 10 == 0:
+                    jobs = json.loads(line)
+                    jobs[0]["title"] += " (updated)"
+                    line = json.dumps(jobs) + "\n"
+                dst.write(line)
+
+        start = time.perf_counter()
+        bulk_import_json_data(edited_path, "file1", db_path, batch_size)
+        bulk = time.perf_counter() - start
+        delta = incremental_import_json_data(edited_path, "file1", db_path, batch_size)
+        close_connection(db_path)
+
+    print(f"jobs: {job_count}, first import {first['seconds']:.2f}s")
+    print(f"bulk re-import:        {bulk:.2f}s (changed jobs are ignored, not updated)")
+    print(f"incremental re-import: {delta['seconds']:.2f}s {delta}")
+
+
+def bench_dedup(job_count):
+    """Times duplicate detection over a fresh table and again with nothing changed."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feed_path = os.path.join(tmp_dir, "feed.json")
+        db_path = os.path.join(tmp_dir, "bench.db")
+        write_synthetic_feed(feed_path, job_count)
+        create_database(db_path)
+        bulk_import_json_data(feed_path, "file1", db_path)
+
+        print(f"jobs: {job_count}")
+        for label in ("first run", "re-run"):
+            start = time.perf_counter()
+            result = find_duplicates(db_path)
+            print(f"{label + ':':11}{time.perf_counter() - start:7.2f}s {result}")
+        close_connection(db_path)
+
+
+def bench_rank(job_count, queries=50):
+    """Times indexing jobs for profile ranking, an update after 1% changed, and top-k queries."""
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feed_path = os.path.join(tmp_dir, "feed.json")
+        db_path = os.path.join(tmp_dir, "bench.db")
+        write_synthetic_feed(feed_path, job_count)
+        incremental_import_json_data(feed_path, "file1", db_path)
+
+        print(f"jobs: {job_count}")
+        start = time.perf_counter()
+        update_index(db_path)
+        print(f"build index:    {time.perf_counter() - start:7.2f}s")
+
+        with open(feed_path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        for jobs in lines[::10]:
+            jobs[0]["description"] += " updated"
+        with open(feed_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(jobs) + "\n" for jobs in lines)
+        incremental_import_json_data(feed_path, "file1", db_path)
+        start = time.perf_counter()
+        changed = update_index(db_path)
+        print(f"update ({changed} jobs): {time.perf_counter() - start:7.2f}s")
+
+        start = time.perf_counter()
+        rank_jobs((0, "", "", "", "", "", "", "python"), db_name=db_path)
+        print(f"load matrix:    {time.perf_counter() - start:7.2f}s")
+        latencies = []
+        for _ in range(queries):
+            profile = (0, "bench", "", "", "", " ".join(rng.sample(WORDS, 6)),
+                       " ".join(rng.sample(WORDS, 3)), "")
+            start = time.perf_counter()
+            rank_jobs(profile, db_name=db_path)
+            latencies.append(time.perf_counter() - start)
+        print(f"top-20 query:   {statistics.median(latencies) * 1000:7.2f}ms median, "
+              f"{max(latencies) * 1000:.2f}ms max")
+        close_connection(db_path)
+
+
+def measure(function):
+    """Runs function once and returns its result, seconds taken and peak traced memory in MB."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_job_list(job_count):
+    """Compares building the GUI job table from every job with fetching single pages."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feed_path = os.path.join(tmp_dir, "feed.json")
+        db_path = os.path.join(tmp_dir, "bench.db")
+        write_synthetic_feed(feed_path, job_count)
+        create_database(db_path)
+        bulk_import_json_data(feed_path, "file1", db_path)
+
+        def load_all():
+            return [[job[1], job[2], job[3]] for job in get_jobs(db_path)]
+
+        def load_first_page():
+            return [[job[1], job[2], job[3]] for job in get_jobs_page(None, PAGE_SIZE, db_path)]
+
+        def load_middle_page():
+            middle_id = f"synthetic-{job_count // 2}"
+            page = get_jobs_page(middle_id, PAGE_SIZE, db_path)
+            return [[job[1], job[2], job[3]] for job in page]
+
+        print(f"jobs: {job_count}")
+        for label, function in (("all jobs", load_all), ("first page", load_first_page),
+                                ("middle page", load_middle_page)):
+            rows, elapsed, peak = measure(function)
+            print(f"{label + ':':13}{len(rows):>8} rows in {elapsed * 1000:8.1f} ms, "
+                  f"peak {peak:7.1f} MB")
+        close_connection(db_path)
+
+
+def bench_generation(request_count, latency):
+    """Compares perceived latency of blocking and streamed generation with a fake model."""
+    job = {"title": "Software Engineer", "company": "TechCorp", "location": "Remote",
+           "description": " ".join(WORDS)}
+    user = (1, "Bench User", "bench@example.com", "", "", "", "", "")
+    with FakeModelServer(latency=latency) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ.update(GEMINI_API_ENDPOINT=server.url, GEMINI_API_KEY="fake-key")
+        main.get_model.cache_clear()
+        main.latency_log.clear()
+        for index in range(request_count):
+            for streamed in (False, True):
+                main.generate_resume_and_cover_letter(
+                    user, job, "resume", regenerate=True,
+                    output_path=os.path.join(tmp_dir, f"{index}.pdf"),
+                    on_chunk=(lambda text: None) if streamed else None,
+                )
+
+    print(f"requests: {request_count} per mode, model latency {latency}s")
+    for mode in ("blocking", "stream"):
+        timings = [timing for timing in main.latency_log if timing["mode"] == mode]
+        first_token = statistics.mean(timing["first_token"] for timing in timings)
+        total = statistics.mean(timing["total"] for timing in timings)
+        print(f"{mode + ':':10} first token {first_token * 1000:7.1f} ms, "
+              f"total {total * 1000:7.1f} ms")
+
+
+def synthetic_document(doc_type, sections, rng):
+    """Markdown shaped like a generated resume or cover letter with the given number of sections."""
+    def sentence(length):
+        return " ".join(rng.choice(WORDS) for _ in range(length))
+
+    if doc_type == "resume":
+        lines = ["# Bench User", "bench@example.com | 555-0100", ""]
+        for _ in range(sections):
+            lines += [f"## {rng.choice(TITLES)} at {rng.choice(COMPANIES)}", ""]
+            lines += [f"- {sentence(14)}" for _ in range(4)] + [""]
+    else:
+        lines = ["**Bench User**", "", "Dear Hiring Manager,", ""]
+        for _ in range(sections):
+            lines += [sentence(80), ""]
+        lines += ["Best regards,", "**Bench User**"]
+    return "\n".join(lines)
+
+
+def pdf_page_count(pdf_path):
+    """Counts the pages of a PDF written by xhtml2pdf."""
+    with open(pdf_path, "rb") as f:
+        return len(re.findall(rb"/Type\s*/Page\b", f.read()))
+
+
+def bench_render(document_count, processes):  # pylint: disable=too-many-locals
+    """Compares PDF rendering in the calling thread with rendering in a process pool."""
+    rng = random.Random(0)
+    lengths = {"short": 2, "medium": 8, "long": 30}
+    serial_renderer = main.PdfRenderer()
+    pool_renderer = main.ProcessPoolRenderer(processes)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Warm up both renderers so imports and worker start-up aren't timed
+        warm_up = os.path.join(tmp_dir, "warm_up.pdf")
+        serial_renderer.render("# Warm up", warm_up)
+        for future in [pool_renderer.submit("# Warm up", warm_up) for _ in range(processes)]:
+            future.result()
+
+        print(f"documents: {document_count} per row, {processes} render processes")
+        for doc_type in ("resume", "cover_letter"):
+            for label, sections in lengths.items():
+                texts = [synthetic_document(doc_type, sections, rng) for _ in range(document_count)]
+                paths = [os.path.join(tmp_dir, f"{doc_type}_{label}_{i}.pdf")
+                         for i in range(document_count)]
+
+                start = time.perf_counter()
+                for text, path in zip(texts, paths):
+                    serial_renderer.render(text, path)
+                serial = time.perf_counter() - start
+                pages = sum(pdf_page_count(path) for path in paths)
+
+                start = time.perf_counter()
+                futures = [pool_renderer.submit(text, path) for text, path in zip(texts, paths)]
+                for future in futures:
+                    future.result()
+                pooled = time.perf_counter() - start
+
+                print(f"{doc_type:13}{label:7}{pages / document_count:5.1f} pages/doc  "
+                      f"serial {pages / serial:7.1f} pages/s  pool {pages / pooled:7.1f} pages/s")
+    pool_renderer.close()
+
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25  # A result may be 25% worse than the baseline before it fails
+NOISE_FLOOR_MS = 0.05  # Latency changes smaller than this are timer noise, not regressions
+REPEAT_JOBS = 100_000  # Imports and full loads are repeated until about this many jobs ran
+SUITE_DESCRIPTION_WORDS = 120  # Keeps the 1M job feeds to about 1 GB each
+
+
+def percentile(values, fraction):
+    """The value below which fraction of the values fall."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def suite_feed(feed_format, job_count, queries, tmp_dir):  # pylint: disable=too-many-locals
+    """
+    Imports, re-imports and queries one synthetic feed. Small feeds are imported
+    and loaded several times and the best run is kept, which is far steadier
+    than a single run. Returns {metric: value}.
+    """
+    feed_path = os.path.join(tmp_dir, f"{feed_format}.json")
+    write_synthetic_feed(feed_path, job_count, feed_format=feed_format,
+                         description_words=SUITE_DESCRIPTION_WORDS)
+    repeats = max(1, min(5, REPEAT_JOBS // job_count))
+    best = {"import": 0.0, "reimport": 0.0, "get_jobs": float("inf")}
+    for attempt in range(repeats):
+        db_path = os.path.join(tmp_dir, f"{feed_format}_{attempt}.db")
+        for label in ("import", "reimport"):
+            start = time.perf_counter()
+            incremental_import_json_data(feed_path, feed_format, db_path)
+            best[label] = max(best[label], job_count / (time.perf_counter() - start))
+        start = time.perf_counter()
+        job_ids = [job[0] for job in get_jobs(db_path)]
+        best["get_jobs"] = min(best["get_jobs"], time.perf_counter() - start)
+        if attempt < repeats - 1:
+            close_connection(db_path)
+            os.remove(db_path)
+    results = {"import_jobs_per_s": best["import"], "reimport_jobs_per_s": best["reimport"],
+               "get_jobs_ms": best["get_jobs"] * 1000}
+
+    rng = random.Random(2)
+    page_latencies, info_latencies = [], []
+    for job_id in rng.choices(job_ids, k=queries):
+        start = time.perf_counter()
+        get_jobs_page(job_id, PAGE_SIZE, db_path)
+        page_latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        get_job_info(job_id, db_path)
+        info_latencies.append(time.perf_counter() - start)
+    results["get_jobs_page_p50_ms"] = percentile(page_latencies, 0.5) * 1000
+    results["get_job_info_p50_ms"] = percentile(info_latencies, 0.5) * 1000
+    results["get_job_info_p95_ms"] = percentile(info_latencies, 0.95) * 1000
+    close_connection(db_path)
+    os.remove(feed_path)
+    return results
+
+
+def suite_generation(documents, latency, tmp_dir):  # pylint: disable=too-many-locals
+    """
+    Generates documents end to end, from prompt to PDF, against the fake model,
+    then asks for the same documents again to time cache hits. The model
+    request and PDF render shares come from the metrics registry.
+    """
+    user = (1, "Bench User", "bench@example.com", "555-0100", "github.com/bench",
+            "Built a job board.", "Databases", "Mentor.")
+    jobs = [{"title": rng_title, "company": "TechCorp", "location": "Remote",
+             "description": " ".join(WORDS)} for rng_title in TITLES]
+    saved_environment = {name: os.environ.get(name)
+                         for name in ("GEMINI_API_ENDPOINT", "GEMINI_API_KEY")}
+    saved_cache, was_enabled = main.document_cache, metrics.registry.enabled
+    timings = {"generate": [], "cached": []}
+    with FakeModelServer(latency=latency) as server:
+        os.environ.update(GEMINI_API_ENDPOINT=server.url, GEMINI_API_KEY="fake-key")
+        main.get_model.cache_clear()
+        main.document_cache = DocumentCache(os.path.join(tmp_dir, "cache"))
+        metrics.registry.reset()
+        metrics.enable()
+        try:
+            main.generate_resume_and_cover_letter(user, jobs[0], "resume", regenerate=True,
+                                                  output_path=os.path.join(tmp_dir, "warm.pdf"))
+            metrics.registry.reset()
+            for label, latencies in timings.items():
+                for index in range(documents):
+                    start = time.perf_counter()
+                    main.generate_resume_and_cover_letter(
+                        user, jobs[index % len(jobs)], ("resume", "cover_letter")[index % 2],
+                        regenerate=label == "generate",
+                        output_path=os.path.join(tmp_dir, f"{label}_{index}.pdf"))
+                    latencies.append(time.perf_counter() - start)
+            histograms = metrics.registry.snapshot()["histograms"]
+        finally:
+            main.document_cache = saved_cache
+            metrics.registry.enabled = was_enabled
+            metrics.registry.reset()
+            for name, value in saved_environment.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            main.get_model.cache_clear()
+    return {
+        "generation_p50_ms": percentile(timings["generate"], 0.5) * 1000,
+        "generation_model_ms": histograms["model_request_seconds"]["mean"] * 1000,
+        "generation_render_ms": histograms["pdf_render_seconds"]["mean"] * 1000,
+        "cached_generation_p50_ms": percentile(timings["cached"], 0.5) * 1000,
+    }
+
+
+def run_suite(scales, documents=10, latency=0.2, queries=2000):
+    """
+    Runs the regression suite.
+    :param scales: Dictionary of scale label to job count, like SCALES.
+    :return: Dictionary with the environment and {metric: value} results.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, job_count in scales.items():
+            for feed_format in ("file1", "file2"):
+                feed_results = suite_feed(feed_format, job_count, queries, tmp_dir)
+                results.update({f"{feed_format}.{label}.{name}": value
+                                for name, value in feed_results.items()})
+        if documents:
+            results.update(suite_generation(documents, latency, tmp_dir))
+    return {
+        "environment": {
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+        },
+        "settings": {"scales": scales, "documents": documents, "latency": latency,
+                     "queries": queries},
+        "results": {name: round(value, 4) for name, value in results.items()},
+    }
+
+
+def higher_is_better(metric):
+    """Throughput metrics improve upwards, latencies downwards."""
+    return metric.endswith("_per_s")
+
+
+def compare_to_baseline(run, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares a run with a baseline run.
+    :return: List of (metric, baseline value, new value, relative change) for
+             every metric worse than the baseline by more than tolerance.
+    """
+    regressions = []
+    for metric, value in run["results"].items():
+        before = baseline["results"].get(metric)
+        if not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better(metric) else change
+        if metric.endswith("_ms") and value - before < NOISE_FLOOR_MS:
+            continue
+        if worse > tolerance:
+            regressions.append((metric, before, value, change))
+    return regressions
+
+
+def bench_suite(scale_labels, documents, latency, baseline_path, save, tolerance):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Runs the suite, prints it next to the baseline and returns the process exit code."""
+    run = run_suite({label: SCALES[label] for label in scale_labels}, documents, latency)
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["environment"] != run["environment"]:
+            print(f"warning: {baseline_path} was recorded on {baseline['environment']}")
+
+    for metric, value in run["results"].items():
+        before = baseline and baseline["results"].get(metric)
+        change = f"{(value - before) / before:+7.1%}" if before else ""
+        print(f"{metric:38}{value:14,.3f} {change}")
+
+    if save:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"baseline saved to {baseline_path}")
+        return 0
+    if baseline is None:
+        print(f"error: no baseline at {baseline_path}, so nothing was checked. Record one with "
+              f"--save-baseline on this machine and commit it.", file=sys.stderr)
+        return 2
+    regressions = compare_to_baseline(run, baseline, tolerance)
+    for metric, before, value, change in regressions:
+        print(f"REGRESSION {metric}: {before:,.3f} -> {value:,.3f} ({change:+.1%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the job database.")
+    parser.add_argument("benchmark",
+                        choices=["import", "reimport", "dedup", "rank", "job-list", "generation",
+                                 "render", "suite"])
+    parser.add_argument("--jobs", type=int, default=10000, help="number of synthetic jobs")
+    parser.add_argument("--batch-size", type=int, default=1000, help="bulk import batch size")
+    parser.add_argument("--requests", type=int, default=10, help="generations per mode")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake model latency in seconds")
+    parser.add_argument("--documents", type=int, default=20, help="documents per render test")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="render pool size")
+    parser.add_argument("--scales", default="1k,100k",
+                        help=f"comma separated suite scales out of {', '.join(SCALES)}")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="suite baseline file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the suite results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="how much worse than the baseline a suite result may be")
+    args = parser.parse_args()
+    if args.benchmark == "suite":
+        sys.exit(bench_suite(args.scales.split(","), args.documents, args.latency, args.baseline,
+                             args.save_baseline, args.tolerance))
+    elif args.benchmark == "import":
+        bench_import(args.jobs, args.batch_size)
+    elif args.benchmark == "dedup":
+        bench_dedup(args.jobs)
+    elif args.benchmark == "rank":
+        bench_rank(args.jobs)
+    elif args.benchmark == "reimport":
+        bench_reimport(args.jobs, args.batch_size)
+    elif args.benchmark == "generation":
+        bench_generation(args.requests, args.latency)
+    elif args.benchmark == "render":
+        bench_render(args.documents, args.processes)
+    else:
+        bench_job_list(args.jobs)
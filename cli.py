@@ -0,0 +1,307 @@
+"""
+cli.py
+
+Headless command-line interface for imports, quarantined records, search,
+ranking, profiles, document generation and export, for scripts and workers
+without a display. It never imports PySimpleGUI. Every command prints one
+JSON object per line: one per feed, query, profile or document, each with
+the seconds it took, so the output can be piped into jq or another process.
+Lists of feeds, queries, job IDs or profiles are read from the arguments,
+from files given with --input, or from stdin when the argument is "-".
+--metrics records timings of the run into a JSON or Prometheus file, and
+--profile before the command captures a cProfile and tracemalloc report of
+it (see metrics.py).
+
+Run with: python cli.py search "python developer" --location "Boston, MA"
+          ls feeds/*.json | python cli.py import -
+          python cli.py quarantine --replay
+          python cli.py generate --profile "Joey P" --input shortlist.txt
+          python cli.py export --profile "Joey P" --input shortlist.txt --zip shortlist.zip
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+import metrics
+from feed_adapters import sniff
+from job_validation import get_quarantine
+from json_database import (
+    DB_NAME, USER_PROFILE_COLUMNS, create_database, create_user_profiles_table,
+    get_job_for_generation, get_user_profiles, incremental_import_json_data, iter_json_records,
+    load_user_profile, replay_quarantine, save_user_profile
+)
+from job_search import DEFAULT_PAGE_SIZE, FILTERS, search_jobs
+from salary_parser import parse_amount
+
+DOC_TYPES = ("resume", "cover_letter")
+
+
+def emit(record, out=None):
+    """Writes one JSON line and flushes it, so a reader downstream sees it right away."""
+    out = out or sys.stdout
+    out.write(json.dumps(record, default=str) + "\n")
+    out.flush()
+
+
+def read_inputs(values, input_files=(), stdin=None):
+    """
+    Collects inputs from the arguments, from input files and, for a "-" argument, from stdin.
+    Blank lines are skipped.
+    """
+    items = []
+    for value in values:
+        if value == "-":
+            items.extend(line.strip() for line in (stdin or sys.stdin) if line.strip())
+        else:
+            items.append(value)
+    for input_file in input_files:
+        with open(input_file, "r", encoding="utf-8") as f:
+            items.extend(line.strip() for line in f if line.strip())
+    return items
+
+
+def timed(function, *args, **kwargs):
+    """Runs function and returns (its result or None, error text or None, seconds taken)."""
+    start = time.perf_counter()
+    try:
+        result, error = function(*args, **kwargs), None
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        result, error = None, f"{type(e).__name__}: {e}"
+    return result, error, round(time.perf_counter() - start, 4)
+
+
+def import_feed(file_path, source, db_name):
+    """Imports one feed incrementally, detecting its adapter from the first records if needed."""
+    if not source:
+        source = sniff(iter_json_records(file_path))[0].name
+    return incremental_import_json_data(file_path, source, db_name)
+
+
+def command_import(args):
+    """Imports each feed incrementally, or all of them in parallel with --workers."""
+    feeds = read_inputs(args.feeds, args.input)
+    if args.workers:
+        from ingest import ingest_feeds  # pylint: disable=import-outside-toplevel
+        result = ingest_feeds(feeds, args.db, args.source, args.workers, progress=None)
+        for feed, stats in result["files"].items():
+            emit({"command": "import", "feed": feed, **stats})
+        return all(stats["error"] is None for stats in result["files"].values())
+
+    create_database(args.db)
+    ok = True
+    for feed in feeds:
+        delta, error, seconds = timed(import_feed, feed, args.source, args.db)
+        record = {"command": "import", "feed": feed, **(delta or {}), "seconds": seconds}
+        if error:
+            record["error"], ok = error, False
+        emit(record)
+    return ok
+
+
+def command_quarantine(args):
+    """Lists the pending quarantined records, after replaying them with --replay."""
+    create_database(args.db)
+    ok = True
+    if args.replay is not None:
+        result, error, seconds = timed(replay_quarantine, args.db, args.replay or None)
+        record = {"command": "replay", **(result or {}), "seconds": seconds}
+        if error:
+            record["error"], ok = error, False
+        emit(record)
+    for entry in get_quarantine(args.db, limit=args.limit):
+        emit({"command": "quarantine", **entry})
+    return ok
+
+
+def command_search(args):
+    """Runs each query with the same filters and page."""
+    filters = {name: getattr(args, name) for name in FILTERS}
+    queries = read_inputs(args.queries, args.input) or [""]
+    ok = True
+    for query in queries:
+        result, error, seconds = timed(search_jobs, query, filters, args.page, args.page_size,
+                                       args.db)
+        record = {"command": "search", "query": query, **(result or {}), "seconds": seconds}
+        if error:
+            record["error"], ok = error, False
+        emit(record)
+    return ok
+
+
+def command_rank(args):
+    """Ranks jobs for each named profile."""
+    from job_ranking import rank_jobs, update_index  # pylint: disable=import-outside-toplevel
+    _, error, seconds = timed(update_index, args.db)
+    emit({"command": "index", "seconds": seconds, **({"error": error} if error else {})})
+    ok = error is None
+    for name in read_inputs(args.profiles, args.input):
+        profile = load_user_profile(name, args.db)
+        if profile is None:
+            emit({"command": "rank", "profile": name, "error": "Unknown profile"})
+            ok = False
+            continue
+        jobs, error, seconds = timed(rank_jobs, profile, args.top, args.db)
+        record = {"command": "rank", "profile": name, "jobs": jobs, "seconds": seconds}
+        if error:
+            record["error"], ok = error, False
+        emit(record)
+    return ok
+
+
+def command_profiles(args):
+    """Lists the saved profiles."""
+    for name in get_user_profiles(args.db):
+        profile = load_user_profile(name, args.db)
+        emit({"command": "profiles", **dict(zip(USER_PROFILE_COLUMNS, profile[1:]))})
+    return True
+
+
+def command_create_profile(args):
+    """Saves profiles given as JSON objects, one per line or in arrays, from files or stdin."""
+    records = []
+    for path in args.files or ["-"]:
+        if path == "-":
+            records.extend(json.loads(line) for line in sys.stdin if line.strip())
+        else:
+            records.extend(iter_json_records(path))
+    ok = True
+    for profile in records:
+        unknown = set(profile) - set(USER_PROFILE_COLUMNS)
+        if not profile.get("name") or unknown:
+            error = f"Unknown fields: {', '.join(sorted(unknown))}" if unknown \
+                else "A profile needs a name"
+            emit({"command": "create-profile", "name": profile.get("name"), "error": error})
+            ok = False
+            continue
+        _, error, seconds = timed(save_user_profile, profile, args.db)
+        record = {"command": "create-profile", "name": profile["name"], "seconds": seconds}
+        if error:
+            record["error"], ok = error, False
+        emit(record)
+    return ok
+
+
+def command_generate(args):
+    """Generates the requested documents for every job ID with one profile."""
+    from main import generate_resume_and_cover_letter, job_output_path  # pylint: disable=import-outside-toplevel
+    profile = load_user_profile(args.profile, args.db)
+    if profile is None:
+        emit({"command": "generate", "profile": args.profile, "error": "Unknown profile"})
+        return False
+    ok = True
+    for job_id in read_inputs(args.job_ids, args.input):
+        job = get_job_for_generation(job_id, args.db)
+        for doc_type in args.doc_type or DOC_TYPES:
+            record = {"command": "generate", "job_id": job_id, "doc_type": doc_type}
+            if job is None:
+                record["error"] = "Unknown job"
+            else:
+                record["pdf_path"], error, record["seconds"] = timed(
+                    generate_resume_and_cover_letter, profile, job, doc_type, args.regenerate,
+                    output_path=job_output_path(profile[1], job_id, doc_type))
+                if error:
+                    record["error"] = error
+            ok = ok and "error" not in record
+            emit(record)
+    return ok
+
+
+def command_export(args):
+    """Exports documents for every job ID and profile, optionally packaged into a zip."""
+    from pdf_export import export_documents  # pylint: disable=import-outside-toplevel
+    results = export_documents(
+        args.profile, read_inputs(args.job_ids, args.input), tuple(args.doc_type or DOC_TYPES),
+        args.db, args.zip, args.workers, args.regenerate,
+        on_result=lambda result: emit({"command": "export", **result}))
+    return all(result["error"] is None for result in results)
+
+
+def build_parser():
+    """The argument parser with one subcommand per command."""
+    parser = argparse.ArgumentParser(description="Job database command-line interface.")
+    parser.add_argument("--db", default=DB_NAME, help="SQLite database to use")
+    parser.add_argument("--metrics", help="write timings to this .json or .prom file")
+    parser.add_argument("--profile", metavar="PREFIX", dest="profile_prefix",
+                        help="write a cProfile and tracemalloc report to PREFIX.prof/.txt")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, function, help_text, items=None, items_help=None):
+        command = commands.add_parser(name, help=help_text)
+        command.set_defaults(function=function)
+        if items:
+            command.add_argument(items, nargs="*", default=[],
+                                 help=f"{items_help}, or - to read them from stdin")
+            command.add_argument("--input", action="append", default=[],
+                                 help=f"file with one of the {items_help} per line")
+        return command
+
+    command = add_command("import", command_import, "import feed files", "feeds", "feed files")
+    command.add_argument("--source", help="source label for every feed (detected by default)")
+    command.add_argument("--workers", type=int,
+                         help="parse feeds in this many processes (new jobs only, no delta)")
+
+    command = add_command("quarantine", command_quarantine,
+                          "list records that failed validation during imports")
+    command.add_argument("--replay", nargs="*", type=int, metavar="ID",
+                         help="import these quarantine entries again, or all pending ones")
+    command.add_argument("--limit", type=int, default=100, help="entries to list")
+
+    command = add_command("search", command_search, "search jobs", "queries", "search queries")
+    command.add_argument("--page", type=int, default=1)
+    command.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    command.add_argument("--remote", dest="is_remote", action="store_const", const=True)
+    for filter_name in FILTERS:
+        if filter_name != "is_remote":
+            command.add_argument(f"--{filter_name.replace('_', '-')}", dest=filter_name,
+                                 type=parse_amount if filter_name.endswith("salary") else str)
+
+    command = add_command("rank", command_rank, "best matching jobs for profiles", "profiles",
+                          "profile names")
+    command.add_argument("--top", type=int, default=DEFAULT_PAGE_SIZE)
+
+    add_command("profiles", command_profiles, "list saved profiles")
+    command = add_command("create-profile", command_create_profile,
+                          "save profiles from JSON objects")
+    command.add_argument("files", nargs="*",
+                         help="JSON or JSON Lines files, or - for stdin (the default)")
+
+    command = add_command("generate", command_generate, "generate documents for jobs",
+                          "job_ids", "job IDs")
+    command.add_argument("--profile", required=True, help="name of a saved profile")
+    command.add_argument("--doc-type", action="append", choices=DOC_TYPES,
+                         help="document type, both by default")
+    command.add_argument("--regenerate", action="store_true", help="skip the document cache")
+
+    command = add_command("export", command_export,
+                          "write documents for jobs to per-job files, optionally zipped",
+                          "job_ids", "job IDs")
+    command.add_argument("--profile", action="append", required=True,
+                         help="name of a saved profile, can be repeated")
+    command.add_argument("--doc-type", action="append", choices=DOC_TYPES,
+                         help="document type, both by default")
+    command.add_argument("--zip", help="also package the documents into this zip file")
+    command.add_argument("--workers", type=int, default=4, help="documents generated at once")
+    command.add_argument("--regenerate", action="store_true",
+                         help="generate new versions even of exported documents")
+    return parser
+
+
+def main(argv=None):
+    """Runs one command. Returns the exit code: 0, or 1 if any item failed."""
+    args = build_parser().parse_args(argv)
+    create_user_profiles_table(args.db)
+    if args.metrics:
+        metrics.enable()
+    with metrics.capture(args.profile_prefix) if args.profile_prefix \
+            else contextlib.nullcontext():
+        ok = args.function(args)
+    if args.metrics:
+        metrics.write_metrics(args.metrics)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+compact_storage.py
+
+Compact storage layout for the jobs database. Company, location,
+employment type and source strings repeat on thousands of rows, so each
+distinct value is stored once in job_values and job_rows keeps its integer
+ID instead. Descriptions, most of a database's size, are stored
+zlib-compressed. A jobs view joins the values back in and decompresses
+descriptions, so everything that reads jobs (get_job_info, search, the GUI)
+works unchanged. json_database writes straight to job_rows through
+CompactEncoder, and INSTEAD OF triggers on the view handle any other writes.
+
+The view uses the decompress_text function that db_connection registers,
+so a compact database has to be opened with get_connection rather than a
+plain sqlite3 connection.
+
+Run with: python compact_storage.py jobs.db
+"""
+
+import argparse
+import os
+
+from db_connection import close_connection, compress_text, get_connection
+from feed_adapters import email_text
+from json_database import DB_NAME, INDEXED_COLUMNS, JOB_COLUMNS, create_database, is_compact
+
+# Columns stored as an ID into job_values
+DIMENSION_COLUMNS = ("company", "location", "employment_type", "source")
+# Columns stored as zlib-compressed blobs
+COMPRESSED_COLUMNS = ("job_description",)
+# Columns of the jobs_fts full-text index
+FTS_COLUMNS = ("title", "company", "job_description")
+
+
+def storage_column(column):
+    """Name of a jobs column in job_rows."""
+    return f"{column}_id" if column in DIMENSION_COLUMNS else column
+
+
+def view_column(column):
+    """Name of a job_rows column in the jobs view."""
+    if column.endswith("_id") and column[:-3] in DIMENSION_COLUMNS:
+        return column[:-3]
+    return column
+
+
+def _table_columns(cursor, table):
+    """(name, type, default) of every column of a table or view."""
+    return [(row[1], row[2], row[4]) for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+def _read_expr(row, column):
+    """SQL reading a jobs column's value from a job_rows row such as new or old."""
+    if column in DIMENSION_COLUMNS:
+        return f"(SELECT value FROM job_values WHERE id = {row}.{column}_id)"
+    if column in COMPRESSED_COLUMNS:
+        return f"decompress_text({row}.{column})"
+    return f"{row}.{column}"
+
+
+def _store_expr(row, column):
+    """SQL turning a jobs column's value from row into what job_rows stores."""
+    if column in DIMENSION_COLUMNS:
+        return f"(SELECT id FROM job_values WHERE value = {row}.{column})"
+    if column in COMPRESSED_COLUMNS:
+        return f"compress_text({row}.{column})"
+    return f"{row}.{column}"
+
+
+class CompactEncoder:
+    """Turns rows ordered like JOB_COLUMNS into job_rows rows, interning dimension values."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = {}
+        self.columns = tuple(storage_column(column) for column in JOB_COLUMNS)
+        self._converters = [
+            self.value_id if column in DIMENSION_COLUMNS
+            else compress_text if column in COMPRESSED_COLUMNS else None
+            for column in JOB_COLUMNS
+        ]
+
+    def value_id(self, value):
+        """ID of value in job_values, adding it the first time it's seen."""
+        if value is None or isinstance(value, (list, dict)):
+            return value  # NULL, or a value SQLite rejects just like in the jobs table
+        value = str(value)
+        value_id = self.ids.get(value)
+        if value_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO job_values (value) VALUES (?)", (value,))
+            value_id = self.ids[value] = self.conn.execute(
+                "SELECT id FROM job_values WHERE value = ?", (value,)).fetchone()[0]
+        return value_id
+
+    def encode(self, row):
+        """Encodes a JOB_COLUMNS row. Extra trailing fields are passed through."""
+        encoded = tuple(convert(value) if convert else value
+                        for convert, value in zip(self._converters, row))
+        return encoded + tuple(row[len(JOB_COLUMNS):])
+
+
+def _index_sql():
+    """Script creating the indexes on job_rows that search and filters use."""
+    return "".join(
+        f"CREATE INDEX IF NOT EXISTS idx_job_rows_{storage_column(column)} "
+        f"ON job_rows ({storage_column(column)});\n"
+        for column in (*INDEXED_COLUMNS, "source")
+    )
+
+
+def _jobs_view_sql(stored):
+    """
+    Script (re)creating the jobs view over job_rows, the triggers that make it
+    writable, the triggers keeping jobs_fts in sync and the indexes on job_rows.
+    :param stored: (name, default) of every job_rows column, in order.
+    """
+    columns = [view_column(name) for name, _ in stored]
+    defaults = {view_column(name): default for name, default in stored if default is not None}
+
+    def new_value(column):
+        value = _store_expr("new", column)
+        return f"coalesce({value}, {defaults[column]})" if column in defaults else value
+
+    intern = "".join(
+        f"INSERT OR IGNORE INTO job_values (value) SELECT new.{column} "
+        f"WHERE new.{column} IS NOT NULL;\n"
+        for column in columns if column in DIMENSION_COLUMNS
+    )
+    selected = ", ".join(
+        f"{column}.value AS {column}" if column in DIMENSION_COLUMNS
+        else f"decompress_text(r.{column}) AS {column}" if column in COMPRESSED_COLUMNS
+        else f"r.{column} AS {column}"
+        for column in columns
+    )
+    joins = " ".join(f"LEFT JOIN job_values {column} ON {column}.id = r.{column}_id"
+                     for column in columns if column in DIMENSION_COLUMNS)
+    # Unchanged descriptions are kept as stored instead of being compressed again
+    assignments = ", ".join(
+        f"{storage_column(column)} = CASE WHEN new.{column} IS old.{column} "
+        f"THEN {storage_column(column)} ELSE {new_value(column)} END"
+        if column in COMPRESSED_COLUMNS else f"{storage_column(column)} = {new_value(column)}"
+        for column in columns
+    )
+    fts_names = ", ".join(FTS_COLUMNS)
+    fts_new = ", ".join(_read_expr("new", column) for column in FTS_COLUMNS)
+    fts_old = ", ".join(_read_expr("old", column) for column in FTS_COLUMNS)
+    fts_stored = ", ".join(storage_column(column) for column in FTS_COLUMNS)
+    fts_changed = " OR ".join(f"new.{storage_column(column)} IS NOT old.{storage_column(column)}"
+                              for column in FTS_COLUMNS)
+    return f"""
+        DROP VIEW IF EXISTS jobs;
+        CREATE VIEW jobs AS SELECT {selected}, r.rowid AS rowid FROM job_rows r {joins};
+        CREATE TRIGGER jobs_insert INSTEAD OF INSERT ON jobs BEGIN
+            {intern}
+            INSERT INTO job_rows ({", ".join(name for name, _ in stored)})
+            VALUES ({", ".join(new_value(column) for column in columns)});
+        END;
+        CREATE TRIGGER jobs_update INSTEAD OF UPDATE ON jobs BEGIN
+            {intern}
+            UPDATE job_rows SET {assignments} WHERE id = old.id;
+        END;
+        CREATE TRIGGER jobs_delete INSTEAD OF DELETE ON jobs BEGIN
+            DELETE FROM job_rows WHERE id = old.id;
+        END;
+        DROP TRIGGER IF EXISTS jobs_fts_insert;
+        DROP TRIGGER IF EXISTS jobs_fts_delete;
+        DROP TRIGGER IF EXISTS jobs_fts_update;
+        CREATE TRIGGER jobs_fts_insert AFTER INSERT ON job_rows BEGIN
+            INSERT INTO jobs_fts (rowid, {fts_names}) VALUES (new.rowid, {fts_new});
+        END;
+        CREATE TRIGGER jobs_fts_delete AFTER DELETE ON job_rows BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, {fts_names})
+            VALUES ('delete', old.rowid, {fts_old});
+        END;
+        CREATE TRIGGER jobs_fts_update AFTER UPDATE OF {fts_stored} ON job_rows
+        WHEN {fts_changed} BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, {fts_names})
+            VALUES ('delete', old.rowid, {fts_old});
+            INSERT INTO jobs_fts (rowid, {fts_names}) VALUES (new.rowid, {fts_new});
+        END;
+        {_index_sql()}
+    """
+
+
+def add_columns(cursor, columns):
+    """
+    Adds columns missing from job_rows and rebuilds the view to show them.
+    Also creates indexes for any columns added to INDEXED_COLUMNS.
+    :param columns: Dictionary of column name to SQL type, like TRACKING_COLUMNS.
+    """
+    existing = {name for name, _, _ in _table_columns(cursor, "job_rows")}
+    missing = [(column, column_type) for column, column_type in columns.items()
+               if column not in existing]
+    for column, column_type in missing:
+        cursor.execute(f"ALTER TABLE job_rows ADD COLUMN {column} {column_type}")
+    if missing:
+        stored = [(name, default) for name, _, default in _table_columns(cursor, "job_rows")]
+        cursor.executescript(_jobs_view_sql(stored))
+    else:
+        cursor.executescript(_index_sql())
+
+
+def _checkpointed_size(conn, db_name):
+    """Size of the database file once the WAL has been written back into it."""
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db_name)
+
+
+def compact_database(db_name=DB_NAME):
+    """
+    Converts a database with a plain jobs table to the compact layout in place.
+    Rows keep their rowids, so the full-text index stays valid. Emails stored as
+    stringified lists are rewritten as plain text on the way.
+    :return: (size before, size after) in bytes, or None if it was already compact.
+    """
+    create_database(db_name)
+    conn = get_connection(db_name)
+    if is_compact(conn):
+        return None
+    before = _checkpointed_size(conn, db_name)
+
+    columns = _table_columns(conn, "jobs")
+    definitions = ", ".join(
+        "id TEXT PRIMARY KEY" if name == "id"
+        else f"{storage_column(name)} INTEGER" if name in DIMENSION_COLUMNS
+        else f"{name} BLOB" if name in COMPRESSED_COLUMNS
+        else f"{name} {column_type}" + (f" DEFAULT {default}" if default is not None else "")
+        for name, column_type, default in columns
+    )
+    values = " UNION ".join(f"SELECT {column} FROM jobs WHERE {column} IS NOT NULL"
+                            for column in DIMENSION_COLUMNS)
+    copied = ", ".join(
+        "email_text(j.email)" if name == "email" else _store_expr("j", name)
+        for name, _, _ in columns
+    )
+    stored = [(storage_column(name), default) for name, _, default in columns]
+    conn.create_function("email_text", 1, email_text)
+    conn.commit()
+    conn.executescript(  # One script, so a failure rolls the whole conversion back
+        f"""
+        BEGIN;
+        CREATE TABLE job_values (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);
+        CREATE TABLE job_rows ({definitions});
+        INSERT INTO job_values (value) {values};
+        INSERT INTO job_rows (rowid, {", ".join(name for name, _ in stored)})
+        SELECT j.rowid, {copied} FROM jobs j ORDER BY j.rowid;
+        DROP TABLE jobs;
+        {_jobs_view_sql(stored)}
+        COMMIT;
+        """
+    )
+    conn.execute("VACUUM")
+    return before, _checkpointed_size(conn, db_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a jobs database to compact storage.")
+    parser.add_argument("db", nargs="?", default=DB_NAME)
+    args = parser.parse_args()
+    sizes = compact_database(args.db)
+    close_connection(args.db)
+    if sizes is None:
+        print(f"{args.db} already uses compact storage")
+    else:
+        print(f"{args.db}: {sizes[0] / 1e6:.1f} MB -> {sizes[1] / 1e6:.1f} MB "
+              f"({1 - sizes[1] / sizes[0]:.0%} smaller)")
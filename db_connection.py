@@ -0,0 +1,118 @@
+"""
+db_connection.py
+
+Shared SQLite access for every module. Instead of opening and closing a
+connection per call, each thread keeps one tuned connection per database
+file and reuses it. Reusing the connection also reuses sqlite3's
+prepared statement cache, so repeated queries skip the SQL compile step.
+Every connection also gets the compress_text and decompress_text SQL
+functions that compact databases (see compact_storage.py) need to read
+their job descriptions.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import zlib
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # Readers don't block the writer and commits don't rewrite pages
+    "PRAGMA synchronous=NORMAL",  # Safe with WAL, avoids an fsync on every commit
+    "PRAGMA cache_size=-65536",  # 64 MB page cache
+    "PRAGMA mmap_size=268435456",  # Read up to 256 MB through memory mapping
+    "PRAGMA temp_store=MEMORY",
+)
+STATEMENT_CACHE_SIZE = 256
+COMPRESSION_LEVEL = 6
+
+_local = threading.local()
+_lock = threading.Lock()
+_open_connections = set()
+
+
+def _file_id(db_name):
+    """Identifies the file behind db_name so a deleted and recreated database is noticed."""
+    if db_name == ":memory:":
+        return None
+    try:
+        stat = os.stat(db_name)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def compress_text(value):
+    """zlib-compresses a string into a blob. Anything else is returned unchanged."""
+    if isinstance(value, str):
+        return zlib.compress(value.encode("utf-8"), COMPRESSION_LEVEL)
+    return value
+
+
+def decompress_text(value):
+    """Reverses compress_text. Strings and NULLs stored before compaction pass through."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def _open(db_name):
+    """Opens and tunes a new connection."""
+    conn = sqlite3.connect(db_name, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.create_function("compress_text", 1, compress_text, deterministic=True)
+    conn.create_function("decompress_text", 1, decompress_text, deterministic=True)
+    with _lock:
+        _open_connections.add(conn)
+    return conn
+
+
+def _close(conn):
+    """Closes a connection and forgets it."""
+    with _lock:
+        _open_connections.discard(conn)
+    conn.close()
+
+
+def get_connection(db_name):
+    """
+    Returns this thread's shared connection to db_name, opening it on first use.
+    Callers commit their own writes and must not close the connection.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    file_id = _file_id(db_name)
+    cached = connections.get(db_name)
+    if cached is not None:
+        conn, cached_file_id = cached
+        if cached_file_id == file_id:
+            return conn
+        _close(conn)  # The file was removed or replaced since it was opened
+
+    conn = _open(db_name)
+    connections[db_name] = (conn, _file_id(db_name))
+    return conn
+
+
+def close_connection(db_name):
+    """Closes this thread's connection to db_name, e.g. before deleting the file."""
+    connections = getattr(_local, "connections", {})
+    cached = connections.pop(db_name, None)
+    if cached is not None:
+        _close(cached[0])
+
+
+def close_all_connections():
+    """Closes every shared connection from every thread."""
+    with _lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        conn.close()
+
+
+atexit.register(close_all_connections)
@@ -0,0 +1,142 @@
+"""
+document_cache.py
+
+On-disk cache for generated resumes and cover letters. Entries are keyed
+by a hash of the rendered prompt, model name and generation config, so
+asking for the same document again is served from disk instead of the
+model. Each entry stores the markdown and the final PDF. Entries expire
+after max_age seconds and the least recently used ones are evicted once
+the cache grows past max_bytes.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+CACHE_DIR = ".document_cache"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # 30 days
+
+
+def cache_key(prompt, model_name, generation_config):
+    """Hashes everything that decides what the model returns into a cache key."""
+    payload = json.dumps(
+        {"prompt": prompt, "model": model_name, "config": generation_config},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DocumentCache:
+    """Content-addressed store of generated markdown and PDFs with LRU eviction."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        # Generation threads share one cache: counters and eviction change under this lock
+        self.lock = threading.Lock()
+
+    def _paths(self, key):
+        """Markdown and PDF file paths for a key."""
+        base = os.path.join(self.cache_dir, key)
+        return base + ".md", base + ".pdf"
+
+    def get(self, key):
+        """
+        Looks up a cached document and marks it as recently used.
+        :return: (markdown text, cached PDF path), or None on a miss.
+        """
+        markdown_path, pdf_path = self._paths(key)
+        try:
+            age = time.time() - os.path.getmtime(pdf_path)
+            if age > self.max_age:
+                self._remove(key)
+                raise FileNotFoundError(pdf_path)
+            with open(markdown_path, "r", encoding="utf-8") as f:
+                markdown_text = f.read()
+            for path in (markdown_path, pdf_path):
+                os.utime(path)  # Modification time doubles as last-used time for LRU
+        except OSError:  # Missing, or evicted by another thread while being read
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return markdown_text, pdf_path
+
+    def put(self, key, markdown_text, pdf_file):
+        """Stores the markdown and a copy of pdf_file under key, then evicts old entries."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        markdown_path, pdf_path = self._paths(key)
+        # Write to unique temporary names first, so readers never see half-written
+        # entries and two writers of the same key don't move each other's files
+        markdown_fd, markdown_temp = tempfile.mkstemp(".tmp", f"{key}.", self.cache_dir)
+        pdf_fd, pdf_temp = tempfile.mkstemp(".tmp", f"{key}.", self.cache_dir)
+        try:
+            with os.fdopen(markdown_fd, "w", encoding="utf-8") as f:
+                f.write(markdown_text)
+            with os.fdopen(pdf_fd, "wb") as f, open(pdf_file, "rb") as source:
+                shutil.copyfileobj(source, f)
+            os.replace(markdown_temp, markdown_path)
+            os.replace(pdf_temp, pdf_path)
+        finally:
+            for temp_path in (markdown_temp, pdf_temp):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        self.evict()
+
+    def _remove(self, key):
+        """Deletes both files of an entry."""
+        for path in self._paths(key):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def _entries(self):
+        """Returns {key: (last used time, total bytes)} for every cached entry."""
+        entries = {}
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for entry in os.scandir(self.cache_dir):
+            key, extension = os.path.splitext(entry.name)
+            if extension not in (".md", ".pdf"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # Removed since the directory was listed
+                continue
+            last_used, size = entries.get(key, (0, 0))
+            entries[key] = (max(last_used, stat.st_mtime), size + stat.st_size)
+        return entries
+
+    def evict(self):
+        """Removes expired entries, then least recently used ones until under max_bytes."""
+        with self.lock:
+            entries = self._entries()
+            now = time.time()
+            total = 0
+            for key, (last_used, size) in sorted(entries.items(), key=lambda item: -item[1][0]):
+                if now - last_used > self.max_age or total + size > self.max_bytes:
+                    self._remove(key)
+                else:
+                    total += size
+
+    def stats(self):
+        """Hit and miss counters plus the current size of the cache."""
+        entries = self._entries()
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size in entries.values()),
+        }
@@ -0,0 +1,139 @@
+"""
+fake_model.py
+
+A local stand-in for the Gemini REST API so generation can be tested and
+benchmarked offline. Responses are deterministic for a given prompt, and
+latency and failures can be configured. Point main.py at it with the
+GEMINI_API_ENDPOINT environment variable:
+
+    with FakeModelServer(latency=0.5) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.url
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_document(prompt):
+    """Deterministic markdown document for a prompt."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    lines = [f"# Generated Document {digest[:12]}", "", "## Summary", ""]
+    lines += [f"- Point {i}: {digest[i * 4:i * 4 + 16]}" for i in range(8)]
+    return "\n".join(lines)
+
+
+def _candidate(text):
+    """One generateContent response body holding text."""
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }]
+    }
+
+
+class FakeModelServer:
+    """Threaded HTTP server answering generateContent and streamGenerateContent."""
+
+    def __init__(self, latency=0.0, failures=0, chunks=4):
+        """
+        :param latency: Seconds each response takes. Streamed responses spread it over
+                        their chunks, so the first chunk arrives after latency / chunks.
+        :param failures: Number of initial requests answered with HTTP 429.
+        :param chunks: Number of pieces a streamed response is split into.
+        """
+        self.latency = latency
+        self.failures = failures
+        self.chunks = chunks
+        self.prompts = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to use as the API endpoint."""
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def requests(self):
+        """Number of requests received, including failed ones."""
+        return len(self.prompts)
+
+    def _record(self, prompt):
+        """Counts a request and says whether it should fail."""
+        with self._lock:
+            self.prompts.append(prompt)
+            return len(self.prompts) <= self.failures
+
+    def _handler_class(self):
+        """Request handler bound to this server's settings."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answers Gemini REST calls with fake documents."""
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Handles generateContent and streamGenerateContent."""
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                                 for part in content.get("parts", []))
+                streamed = ":streamGenerateContent" in self.path
+                time.sleep(fake.latency / fake.chunks if streamed else fake.latency)
+                if fake._record(prompt):  # pylint: disable=protected-access
+                    self._send_json(429, {"error": {"code": 429, "message": "Rate limited",
+                                                    "status": "RESOURCE_EXHAUSTED"}})
+                    return
+                text = fake_document(prompt)
+                if not streamed:
+                    self._send_json(200, _candidate(text))
+                    return
+                # Streamed responses are one JSON array written a chunk at a time
+                size = -(-len(text) // fake.chunks)
+                pieces = [text[i:i + size] for i in range(0, len(text), size)]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b"[")
+                for index, piece in enumerate(pieces):
+                    if index:
+                        self.wfile.write(b",")
+                        time.sleep(fake.latency / fake.chunks)
+                    self.wfile.write(json.dumps(_candidate(piece)).encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"]")
+
+            def _send_json(self, status, payload):
+                """Writes a complete JSON response."""
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """Keeps test output quiet."""
+
+        return Handler
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
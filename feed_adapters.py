@@ -0,0 +1,313 @@
+"""
+feed_adapters.py
+
+Feed adapters turn the raw records of one job board's feed into rows of the
+unified jobs schema. Each adapter declares its field mapping once, and the
+mapping is compiled into a specialized normalizer function, so a record is
+normalized by straight-line key lookups that build the database row
+directly. Salary strings go through a cache, since feeds repeat the same
+few hundred of them. The adapter for a file is detected from a sample of
+its records.
+
+Adding a job board needs no code changes: put a JSON file in the adapters/
+directory, such as
+
+    {"name": "board3", "signature": ["jobkey"],
+     "fields": {"id": "jobkey", "title": "jobtitle", "location": ["city", "region"],
+                "email": {"keys": ["contact"], "convert": "email_text"},
+                "is_remote": {"keys": ["remote"], "default": false}},
+     "salary": {"text": "pay"}}
+
+A field maps to a key, to a list of keys where the first with a value wins,
+or to an object with keys, a converter from CONVERTERS and a default.
+signature lists keys only this board's records have, for detection.
+
+Run with: python feed_adapters.py rapid_jobs2.json
+"""
+
+import argparse
+import ast
+import functools
+import glob
+import itertools
+import json
+import os
+
+from salary_parser import (
+    DEFAULT_CURRENCY, EMPTY_SALARY, cached_salary_range, parse_salary_range, salary_from_amounts,
+    to_number
+)
+
+ADAPTER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "adapters")
+SAMPLE_SIZE = 50  # Records read to detect a feed's adapter
+FALLBACK_ADAPTER = "file2"  # Used when no adapter's signature matches the sample
+
+# Fields of a unified job, in the order of json_database.JOB_COLUMNS
+UNIFIED_FIELDS = (
+    "id", "title", "company", "location", "employment_type", "date_posted", "salary_min",
+    "salary_max", "salary_currency", "is_remote", "description", "job_url", "source", "email",
+    "salary_period",
+)
+SALARY_FIELDS = frozenset(EMPTY_SALARY)
+
+
+def email_text(emails):
+    """
+    Stores a job's emails as comma separated text. Feeds give them as a list,
+    and older databases hold them as a stringified Python list.
+    """
+    if isinstance(emails, str) and emails.startswith("["):
+        try:
+            emails = ast.literal_eval(emails)
+        except (ValueError, SyntaxError):
+            return emails
+    if isinstance(emails, (list, tuple)):
+        return ", ".join(str(email) for email in emails if email) or None
+    return emails
+
+
+def provider_url(providers):
+    """URL of the first entry of a jobProviders list."""
+    if isinstance(providers, list) and providers and isinstance(providers[0], dict):
+        return providers[0].get("url")
+    return None
+
+
+def salary_text(text, default_currency=DEFAULT_CURRENCY):
+    """Salary fields parsed from a salary string, cached for strings that repeat."""
+    try:
+        return cached_salary_range(text, default_currency)
+    except TypeError:  # Unhashable values can't be cached
+        return parse_salary_range(text, default_currency) or EMPTY_SALARY
+
+
+# Converters JSON adapter files can name
+CONVERTERS = {"email_text": email_text, "provider_url": provider_url, "bool": bool, "str": str}
+
+
+class Field:  # pylint: disable=too-few-public-methods
+    """One raw key a unified field is read from, with an optional converter and default."""
+
+    def __init__(self, key, convert=None, default=None):
+        self.key = key
+        self.convert = convert
+        self.default = default
+
+
+class Salary:  # pylint: disable=too-few-public-methods
+    """
+    Raw keys holding pay. Numeric low/high amounts win over the text, which is
+    parsed like "120K–130K a year". Any of them can be None.
+    """
+
+    def __init__(self, text=None, low=None, high=None, interval=None, currency=None,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 default_currency=DEFAULT_CURRENCY):
+        self.text = text
+        self.low = low
+        self.high = high
+        self.interval = interval
+        self.currency = currency
+        self.default_currency = default_currency
+
+
+class FeedAdapter:
+    """A job board's field mapping, compiled into a function from raw record to row."""
+
+    def __init__(self, name, fields, signature=(), salary=None):
+        """
+        :param name: Adapter name, also the source label of jobs imported without one.
+        :param fields: {unified field: key, Field, or tuple of them tried in order}.
+        :param signature: Keys whose presence marks a record as this board's.
+        :param salary: Salary describing where pay is, or None for no pay.
+        """
+        # Salary fields come from salary and source from the import, not from the mapping
+        invalid = set(fields) - set(UNIFIED_FIELDS) | set(fields) & (SALARY_FIELDS | {"source"})
+        if invalid:
+            raise ValueError(f"Feed adapter {name} can't map: {', '.join(sorted(invalid))}")
+        self.name = name
+        self.fields = fields
+        self.signature = tuple(signature)
+        self.salary = salary
+        self.source_code, self.row = self._compile()
+
+    def _compile(self):
+        """
+        Generates the normalizer's source and compiles it. It reads every field
+        with plain job.get calls and returns the row as one tuple expression.
+        """
+        namespace = {"_salary_amounts": salary_from_amounts, "_salary_text": salary_text,
+                     "_number": to_number, "_empty_salary": EMPTY_SALARY}
+
+        def constant(value):
+            name = f"_c{len(namespace)}"
+            namespace[name] = value
+            return name
+
+        def lookup(key):
+            return "None" if key is None else f"get({key!r})"
+
+        def alternative(spec):
+            spec = Field(spec) if isinstance(spec, str) else spec
+            value = lookup(spec.key) if spec.default is None \
+                else f"get({spec.key!r}, {constant(spec.default)})"
+            return f"{constant(spec.convert)}({value})" if spec.convert else value
+
+        def expression(field):
+            if field == "source":
+                return "source"
+            if field in SALARY_FIELDS:
+                return f"salary[{field!r}]"
+            spec = self.fields.get(field)
+            if spec is None:
+                return "None"
+            alternatives = spec if isinstance(spec, tuple) else (spec,)
+            return "(" + " or ".join(map(alternative, alternatives)) + ")"
+
+        lines = ["def normalize(job, source):", "    get = job.get"]
+        salary = self.salary
+        if salary is None:
+            lines.append("    salary = _empty_salary")
+        else:
+            text = (f"_salary_text({lookup(salary.text)}, {salary.default_currency!r})"
+                    if salary.text else "_empty_salary")
+            if salary.low or salary.high:
+                amounts = (f"_salary_amounts(low, high, {lookup(salary.interval)}, "
+                           f"{lookup(salary.currency)})")
+                lines += [
+                    f"    low = _number({lookup(salary.low)})",
+                    f"    high = _number({lookup(salary.high)})",
+                    f"    salary = {amounts} if low is not None or high is not None else {text}",
+                ]
+            else:
+                lines.append(f"    salary = {text}")
+        lines.append("    return (" + ", ".join(map(expression, UNIFIED_FIELDS)) + ")")
+        source_code = "\n".join(lines) + "\n"
+        exec(compile(source_code, f"<feed adapter {self.name}>", "exec"), namespace)  # pylint: disable=exec-used
+        return source_code, namespace["normalize"]
+
+    def unify(self, job, source):
+        """A raw record as a unified job dictionary."""
+        return dict(zip(UNIFIED_FIELDS, self.row(job, source)))
+
+    def matches(self, record):
+        """Whether record has one of this board's signature keys."""
+        return isinstance(record, dict) and any(key in record for key in self.signature)
+
+
+_adapters = {}  # name -> FeedAdapter, in the order they were registered
+
+
+def register_adapter(adapter):
+    """Adds or replaces an adapter. Earlier adapters win detection ties."""
+    _adapters[adapter.name] = adapter
+    return adapter
+
+
+def _field_spec(spec):
+    """A JSON field mapping as a key, Field or tuple of them."""
+    if isinstance(spec, list):
+        return tuple(_field_spec(item) for item in spec)
+    if isinstance(spec, dict):
+        convert = spec.get("convert")
+        if convert is not None and convert not in CONVERTERS:
+            raise ValueError(f"Unknown converter {convert!r}")
+        alternatives = tuple(Field(key, CONVERTERS.get(convert), spec.get("default"))
+                             for key in spec["keys"])
+        return alternatives[0] if len(alternatives) == 1 else alternatives
+    return spec
+
+
+def adapter_from_spec(spec):
+    """Builds an adapter from a JSON-style dictionary, as described at the top of this file."""
+    salary = spec.get("salary")
+    return FeedAdapter(
+        spec["name"],
+        {field: _field_spec(value) for field, value in spec.get("fields", {}).items()},
+        spec.get("signature", ()),
+        Salary(**salary) if salary is not None else None,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _load_adapter_files(adapter_dir=ADAPTER_DIR):
+    """Registers the adapters in adapter_dir, once per process."""
+    for path in sorted(glob.glob(os.path.join(adapter_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            register_adapter(adapter_from_spec(json.load(f)))
+
+
+def get_adapters():
+    """Every registered adapter by name, including the ones from the adapters/ directory."""
+    _load_adapter_files()
+    return _adapters
+
+
+def detect_adapter(sample):
+    """The adapter whose signature matches the most records of sample, or the fallback."""
+    adapters = get_adapters()
+    best, best_count = adapters[FALLBACK_ADAPTER], 0
+    for adapter in adapters.values():
+        count = sum(1 for record in sample if adapter.matches(record))
+        if count > best_count:
+            best, best_count = adapter, count
+    return best
+
+
+def sniff(records, source=None, sample_size=SAMPLE_SIZE):
+    """
+    Picks the adapter for a stream of raw records: the one named source, or
+    the one detected from the first sample_size records.
+    :return: (adapter, iterator over all the records, the sample included)
+    """
+    records = iter(records)
+    sample = list(itertools.islice(records, sample_size))
+    adapter = get_adapters().get(source) or detect_adapter(sample)
+    return adapter, itertools.chain(sample, records)
+
+
+# Both built-in formats also read the other's key names, since older exports mix them
+register_adapter(FeedAdapter(
+    "file1",  # rapid_jobs2.json
+    {
+        "id": "id", "title": "title", "company": "company", "location": "location",
+        "employment_type": ("employmentType", "job_type"),
+        "date_posted": ("datePosted", "date_posted"),
+        "is_remote": Field("is_remote", default=False),
+        "description": "description",
+        "job_url": ("job_url", Field("jobProviders", provider_url)),
+        "email": Field("emails", email_text),
+    },
+    signature=("jobProviders", "employmentType"),
+    salary=Salary("salaryRange", "min_amount", "max_amount", "interval", "currency"),
+))
+register_adapter(FeedAdapter(
+    "file2",  # rapidResults.json
+    {
+        "id": "id", "title": "title", "company": "company", "location": "location",
+        "employment_type": ("job_type", "employmentType"),
+        "date_posted": ("date_posted", "datePosted"),
+        "is_remote": Field("is_remote", default=False),
+        "description": "description",
+        "job_url": ("job_url", Field("jobProviders", provider_url)),
+        "email": Field("emails", email_text),
+    },
+    signature=("job_url", "job_type", "site", "min_amount", "interval"),
+    salary=Salary("salaryRange", "min_amount", "max_amount", "interval", "currency"),
+))
+
+
+if __name__ == "__main__":
+    from json_database import iter_json_records  # pylint: disable=import-outside-toplevel,cyclic-import
+
+    parser = argparse.ArgumentParser(description="Show the adapter detected for feed files.")
+    parser.add_argument("feeds", nargs="+", help="JSON feed files")
+    parser.add_argument("--source", help="adapter to use instead of detecting one")
+    args = parser.parse_args()
+    for feed in args.feeds:
+        feed_adapter, feed_records = sniff(iter_json_records(feed), args.source)
+        print(f"{feed}: {feed_adapter.name}")
+        print(feed_adapter.source_code)
+        first = next(feed_records, None)
+        if first is not None:
+            print(json.dumps(feed_adapter.unify(first, feed_adapter.name), indent=2,
+                             default=str)[:2000])
@@ -0,0 +1,156 @@
+"""
+ingest.py
+
+Parallel ingestion of many job feed files. Parsing, feed adapter
+normalization and validation run in a process pool, one file per worker, and the unified rows
+and quarantined records are sent through a queue to a single batched SQLite writer in the main
+process.
+
+Run with: python ingest.py feeds/ "more_feeds/*.json" --workers 15
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from db_connection import get_connection
+from job_validation import write_quarantine
+from json_database import (
+    DB_NAME, DEFAULT_BATCH_SIZE, create_database, insert_job_rows, iter_job_rows
+)
+
+FEED_EXTENSIONS = (".json", ".jsonl")
+QUEUE_BATCHES = 64  # Batches buffered per worker before parsing waits on the writer
+
+
+def expand_feed_paths(patterns):
+    """Turns directories and glob patterns into a sorted list of feed files."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                       if name.endswith(FEED_EXTENSIONS)]
+        else:
+            matches = glob.glob(pattern)
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return sorted(set(paths))
+
+
+def parse_feed(file_path, source, queue, batch_size):
+    """
+    Worker: parses, normalizes and validates one feed file, sending row batches and
+    quarantined records to the writer.
+    Always finishes with a ("done", file_path, parsed, quarantined, seconds, error)
+    message, where parsed counts valid rows and quarantined the records left out.
+    """
+    start = time.perf_counter()
+    counts = {"rows": 0, "quarantine": 0}
+    error = None
+    quarantined = []
+
+    def send(kind, items):
+        queue.put((kind, file_path, list(items)))
+        counts[kind] += len(items)
+        items.clear()
+
+    try:
+        batch = []
+        for row in iter_job_rows(file_path, source, quarantined, batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                send("rows", batch)
+            if len(quarantined) >= batch_size:
+                send("quarantine", quarantined)
+        for kind, items in (("rows", batch), ("quarantine", quarantined)):
+            if items:
+                send(kind, items)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # Report instead of raising so the writer isn't left waiting for this file
+        error = f"{type(e).__name__}: {e}"
+    queue.put(("done", file_path, counts["rows"], counts["quarantine"],
+               time.perf_counter() - start, error))
+
+
+def format_file_stats(file_path, stats):
+    """One progress line for a finished feed file."""
+    line = (f"{file_path}: parsed {stats['parsed']} in {stats['seconds']:.2f}s "
+            f"({stats['parsed'] / max(stats['seconds'], 1e-9):,.0f} jobs/s), "
+            f"inserted {stats['inserted']}, ignored {stats['ignored']}, "
+            f"rejected {stats['rejected']} ({stats['quarantined']} quarantined)")
+    if stats["error"]:
+        line += f", failed: {stats['error']}"
+    return line
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+def ingest_feeds(file_paths, db_name=DB_NAME, source=None, workers=None,
+                 batch_size=DEFAULT_BATCH_SIZE, progress=print):
+    """
+    Imports many feed files in parallel through one SQLite writer.
+    :param source: Source label for every file, detected per file when None.
+    :param workers: Parser processes, defaults to one less than the CPU count.
+    :param progress: Called with a status line as each file finishes, or None.
+    :return: Dictionary with per-file stats under "files" and the run totals under "total".
+             parsed counts valid rows; quarantined records count as rejected and
+             quarantined but not as parsed.
+    """
+    create_database(db_name)
+    workers = max(1, min(workers or (os.cpu_count() or 2) - 1, len(file_paths) or 1))
+    file_stats = {path: {"parsed": 0, "seconds": 0.0, "inserted": 0, "ignored": 0,
+                         "rejected": 0, "quarantined": 0, "error": None}
+                  for path in file_paths}
+    start = time.perf_counter()
+
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(workers) as pool:
+        queue = manager.Queue(maxsize=QUEUE_BATCHES * workers)
+        futures = [pool.submit(parse_feed, path, source, queue, batch_size)
+                   for path in file_paths]
+        conn = get_connection(db_name)
+        remaining = len(file_paths)
+        while remaining:
+            message = queue.get()
+            stats = file_stats[message[1]]
+            if message[0] == "rows":
+                for key, count in insert_job_rows(conn, message[2], batch_size).items():
+                    stats[key] += count
+            elif message[0] == "quarantine":
+                write_quarantine(conn, message[2])
+                conn.commit()
+                stats["rejected"] += len(message[2])
+            else:
+                (_, file_path, stats["parsed"], stats["quarantined"], stats["seconds"],
+                 stats["error"]) = message
+                remaining -= 1
+                if progress:
+                    progress(format_file_stats(file_path, stats))
+        for future in futures:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    total = {key: sum(stats[key] for stats in file_stats.values())
+             for key in ("parsed", "inserted", "ignored", "rejected", "quarantined")}
+    total["seconds"] = elapsed
+    total["jobs_per_second"] = total["parsed"] / max(elapsed, 1e-9)
+    if progress:
+        progress(f"total: {total['parsed']} jobs from {len(file_paths)} files in {elapsed:.2f}s "
+                 f"({total['jobs_per_second']:,.0f} jobs/s) with {workers} parser processes")
+    return {"files": file_stats, "total": total}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import job feed files in parallel.")
+    parser.add_argument("paths", nargs="+", help="feed files, directories or glob patterns")
+    parser.add_argument("--db", default=DB_NAME, help="SQLite database to write to")
+    parser.add_argument("--source", help="source label for all files (detected by default)")
+    parser.add_argument("--workers", type=int, help="number of parser processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per writer transaction")
+    args = parser.parse_args()
+
+    feed_paths = expand_feed_paths(args.paths)
+    if not feed_paths:
+        parser.error("no feed files found")
+    ingest_feeds(feed_paths, args.db, args.source, args.workers, args.batch_size)
@@ -0,0 +1,245 @@
+"""
+job_dedup.py
+
+Finds the same posting imported more than once, usually once from each
+feed under different IDs. Every job gets a normalized title/company/location
+key and a MinHash signature of its description. Locality-sensitive hashing
+splits each signature into bands, and only jobs that share a band bucket or
+a key are compared, so the work grows with the number of jobs rather than
+the number of pairs. Signatures and buckets are stored in the database and
+only recomputed for jobs whose content changed; clusters of duplicates are
+written to the duplicate_clusters table.
+
+Run with: python job_dedup.py --threshold 0.8
+"""
+
+import argparse
+import operator
+import re
+import zlib
+from array import array
+
+from db_connection import get_connection
+from json_database import DB_NAME, create_database
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows catch most pairs above ~0.5 similarity as candidates
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3  # Words per shingle
+DEFAULT_THRESHOLD = 0.8  # Estimated description similarity that makes two jobs duplicates
+KEY_THRESHOLD = 0.5  # Lower bar for jobs that also share a title/company/location key
+KEY_BAND = -1  # Band number used to bucket jobs by their normalized key
+MAX_REPRESENTATIVES = 32  # Distinct postings a job is compared with per bucket
+
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_BIN_RANGE = 1 << (32 - _BIN_BITS)  # Hash values left in a bin after its number is taken off
+_EMPTY = _BIN_RANGE * NUM_PERM
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_COMPANY_SUFFIX = re.compile(r"\b(inc|llc|ltd|corp|corporation|co|company|plc|gmbh)\b")
+
+
+def create_dedup_tables(db_name=DB_NAME):
+    """Creates the tables holding signatures, LSH buckets and duplicate clusters."""
+    conn = get_connection(db_name)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS job_minhash (
+            job_id TEXT PRIMARY KEY,
+            content_hash TEXT,
+            signature BLOB
+        );
+        CREATE TABLE IF NOT EXISTS job_lsh (
+            band INTEGER,
+            bucket INTEGER,
+            job_id TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_lsh_bucket ON job_lsh (band, bucket);
+        CREATE INDEX IF NOT EXISTS idx_job_lsh_job ON job_lsh (job_id);
+        CREATE TABLE IF NOT EXISTS duplicate_clusters (
+            job_id TEXT PRIMARY KEY,
+            cluster_id TEXT,
+            similarity REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_duplicate_clusters_cluster
+            ON duplicate_clusters (cluster_id);
+        """
+    )
+
+
+def normalized_key(title, company, location):
+    """Title, company and location lowercased, without punctuation or company suffixes."""
+    def clean(text):
+        return " ".join(_WORD.findall((text or "").lower()))
+    return "|".join((clean(title), _COMPANY_SUFFIX.sub("", clean(company)).strip(),
+                     clean(location)))
+
+
+def shingles(text):
+    """Hashes of every SHINGLE_SIZE-word run in text."""
+    words = _WORD.findall((text or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+            for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_hashes):
+    """
+    MinHash signature of a set of shingle hashes, or None for an empty set.
+    Uses one permutation hashing: each shingle is hashed once and the low bits
+    pick which of the NUM_PERM bins it competes in, which is NUM_PERM times less
+    work than one hash per permutation. Empty bins borrow the next filled bin's
+    minimum, offset by the distance, so short descriptions still compare fairly.
+    """
+    if not shingle_hashes:
+        return None
+    mins = [_EMPTY] * NUM_PERM
+    for value in shingle_hashes:
+        value = (value * 0x9E3779B1) & 0xFFFFFFFF  # Spread crc32 values evenly over the bins
+        bin_number, rest = value & (NUM_PERM - 1), value >> _BIN_BITS
+        if rest < mins[bin_number]:
+            mins[bin_number] = rest
+    filled = list(mins)
+    for bin_number in range(NUM_PERM):
+        if filled[bin_number] == _EMPTY:
+            distance = 1
+            while filled[(bin_number + distance) % NUM_PERM] == _EMPTY:
+                distance += 1
+            mins[bin_number] = filled[(bin_number + distance) % NUM_PERM] + distance * _BIN_RANGE
+    return array("I", mins)
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two descriptions from their signatures."""
+    if signature_a is None or signature_b is None:
+        return 1.0 if signature_a is signature_b else 0.0
+    return sum(map(operator.eq, signature_a, signature_b)) / NUM_PERM
+
+
+def lsh_buckets(key, signature):
+    """(band, bucket) pairs a job is filed under: one per signature band plus its key."""
+    buckets = [(KEY_BAND, zlib.crc32(key.encode("utf-8")))]
+    if signature is not None:
+        for band in range(BANDS):
+            rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+            buckets.append((band, zlib.crc32(rows.tobytes())))
+    return buckets
+
+
+def update_signatures(db_name=DB_NAME, batch_size=1000):
+    """
+    Computes signatures and buckets for new and changed jobs and drops them for deleted ones.
+    :return: Number of jobs (re)hashed.
+    """
+    create_database(db_name)
+    create_dedup_tables(db_name)
+    conn = get_connection(db_name)
+    conn.execute("DELETE FROM job_lsh WHERE job_id NOT IN (SELECT id FROM jobs)")
+    conn.execute("DELETE FROM job_minhash WHERE job_id NOT IN (SELECT id FROM jobs)")
+    changed = conn.execute(
+        """
+        SELECT j.id, j.title, j.company, j.location, j.job_description, j.content_hash
+        FROM jobs j LEFT JOIN job_minhash m ON m.job_id = j.id
+        WHERE m.job_id IS NULL OR m.content_hash IS NOT j.content_hash
+        """
+    )
+    count = 0
+    while True:
+        rows = changed.fetchmany(batch_size)
+        if not rows:
+            break
+        signatures, buckets = [], []
+        for job_id, title, company, location, description, row_hash in rows:
+            signature = minhash(shingles(description))
+            signatures.append((job_id, row_hash, signature.tobytes() if signature else None))
+            buckets += [(band, bucket, job_id)
+                        for band, bucket in lsh_buckets(normalized_key(title, company, location),
+                                                        signature)]
+        conn.executemany("DELETE FROM job_lsh WHERE job_id = ?", ((row[0],) for row in rows))
+        conn.executemany("INSERT OR REPLACE INTO job_minhash VALUES (?, ?, ?)", signatures)
+        conn.executemany("INSERT INTO job_lsh VALUES (?, ?, ?)", buckets)
+        count += len(rows)
+    conn.commit()
+    return count
+
+
+def _signature(conn, job_id, cache):
+    """Loads a stored signature, remembering it for the rest of the run."""
+    if job_id not in cache:
+        blob = conn.execute("SELECT signature FROM job_minhash WHERE job_id = ?",
+                            (job_id,)).fetchone()[0]
+        cache[job_id] = array("I", blob) if blob else None
+    return cache[job_id]
+
+
+def _find(parents, job_id):
+    """Union-find lookup with path halving."""
+    while parents.get(job_id, job_id) != job_id:
+        parents[job_id] = parents.get(parents[job_id], parents[job_id])
+        job_id = parents[job_id]
+    return job_id
+
+
+def find_duplicates(db_name=DB_NAME, threshold=DEFAULT_THRESHOLD):  # pylint: disable=too-many-locals
+    """
+    Groups near-duplicate jobs and rewrites the duplicate_clusters table.
+    Within each bucket, every job is compared with the jobs already chosen as
+    representatives of that bucket (at most MAX_REPRESENTATIVES), so a bucket
+    of n jobs costs a bounded number of comparisons per job instead of n squared.
+    :return: Dictionary counting clusters and the jobs in them.
+    """
+    update_signatures(db_name)
+    conn = get_connection(db_name)
+    parents, best, cache = {}, {}, {}
+    buckets = conn.execute(
+        "SELECT band, group_concat(job_id, char(31)) FROM job_lsh "
+        "GROUP BY band, bucket HAVING COUNT(*) > 1"
+    )
+    for band, members in buckets:
+        needed = KEY_THRESHOLD if band == KEY_BAND else threshold
+        representatives = []
+        for job_id in members.split("\x1f"):
+            signature = _signature(conn, job_id, cache)
+            for representative in representatives:
+                score = similarity(signature, _signature(conn, representative, cache))
+                if score >= needed:
+                    root_a, root_b = _find(parents, job_id), _find(parents, representative)
+                    if root_a != root_b:
+                        parents[max(root_a, root_b)] = min(root_a, root_b)
+                    for member in (job_id, representative):
+                        best[member] = max(best.get(member, 0.0), score)
+                    break
+            else:
+                if len(representatives) < MAX_REPRESENTATIVES:
+                    representatives.append(job_id)
+        if len(cache) > 100000:  # Bound memory on huge tables; signatures are reloaded
+            cache.clear()
+
+    clusters = [(job_id, _find(parents, job_id), score) for job_id, score in best.items()]
+    conn.execute("DELETE FROM duplicate_clusters")
+    conn.executemany("INSERT INTO duplicate_clusters VALUES (?, ?, ?)", clusters)
+    conn.commit()
+    return {"clusters": len({cluster for _, cluster, _ in clusters}), "jobs": len(clusters)}
+
+
+def get_duplicates(job_id, db_name=DB_NAME):
+    """IDs of the other jobs in job_id's duplicate cluster."""
+    rows = get_connection(db_name).execute(
+        """
+        SELECT other.job_id FROM duplicate_clusters own
+        JOIN duplicate_clusters other ON other.cluster_id = own.cluster_id
+        WHERE own.job_id = ? AND other.job_id != own.job_id ORDER BY other.job_id
+        """,
+        (job_id,),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find duplicate job postings.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="estimated description similarity for a duplicate")
+    args = parser.parse_args()
+    print(find_duplicates(args.db, args.threshold))
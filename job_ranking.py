@@ -0,0 +1,241 @@
+"""
+job_ranking.py
+
+Ranks jobs by how well they match a user profile. Job titles and
+descriptions and the profile's projects, classes and other fields are turned
+into TF-IDF vectors, and jobs are scored by cosine similarity. Term counts
+and document frequencies are stored in the database and only recomputed for
+new and changed jobs, so the index follows incremental imports. The scoring
+matrix is built from them once per process, column by column, so a query
+only touches the jobs that contain one of the profile's terms.
+
+Run with: python job_ranking.py "Joey P" --top 10
+"""
+
+import argparse
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from db_connection import get_connection
+from json_database import DB_NAME, create_database, load_user_profile
+
+DEFAULT_TOP_K = 20
+TITLE_WEIGHT = 3  # A title word counts as much as this many description words
+PROFILE_COLUMNS = {"projects": 5, "classes": 6, "other": 7}  # user_profiles column indexes
+MIN_TERM_LENGTH = 2
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this "
+    "to was we were will with you your".split()
+)
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]", re.UNICODE)
+_indexes = {}  # db_name -> (generation, RankingIndex)
+
+
+def create_ranking_tables(db_name=DB_NAME):
+    """Creates the tables holding the vocabulary and each job's term counts."""
+    conn = get_connection(db_name)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS rank_terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT UNIQUE,
+            df INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS rank_docs (
+            job_id TEXT PRIMARY KEY,
+            content_hash TEXT,
+            term_ids BLOB,
+            counts BLOB
+        );
+        CREATE TABLE IF NOT EXISTS rank_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        );
+        INSERT OR IGNORE INTO rank_meta VALUES ('generation', 0);
+        """
+    )
+
+
+def tokenize(text):
+    """Lowercased terms of text, without stop words. Keeps terms like c++, c# and node.js."""
+    return [term for term in _WORD.findall((text or "").lower())
+            if len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS]
+
+
+def job_terms(title, description):
+    """Term counts of a job, with title words weighted up."""
+    counts = Counter(tokenize(description))
+    for term in tokenize(title):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+def profile_text(profile):
+    """The text of a user_profiles row that is matched against jobs."""
+    return " ".join(str(profile[index] or "") for index in PROFILE_COLUMNS.values())
+
+
+def update_index(db_name=DB_NAME, batch_size=1000):  # pylint: disable=too-many-locals
+    """
+    Indexes new and changed jobs and drops deleted and stale ones.
+    :return: Number of jobs (re)indexed or dropped.
+    """
+    create_database(db_name)
+    create_ranking_tables(db_name)
+    conn = get_connection(db_name)
+    vocabulary = dict(conn.execute("SELECT term, id FROM rank_terms"))
+    df_changes = Counter()
+
+    removed = conn.execute(
+        "SELECT job_id, term_ids, counts FROM rank_docs WHERE job_id NOT IN "
+        "(SELECT id FROM jobs WHERE NOT coalesce(stale, 0))"
+    ).fetchall()
+    for _, term_ids, _ in removed:
+        df_changes.subtract(array("I", term_ids))
+    conn.executemany("DELETE FROM rank_docs WHERE job_id = ?", ((row[0],) for row in removed))
+
+    changed = conn.execute(
+        """
+        SELECT j.id, j.title, j.job_description, j.content_hash, d.term_ids
+        FROM jobs j LEFT JOIN rank_docs d ON d.job_id = j.id
+        WHERE NOT coalesce(j.stale, 0)
+          AND (d.job_id IS NULL OR d.content_hash IS NOT j.content_hash)
+        """
+    )
+    count = len(removed)
+    while True:
+        rows = changed.fetchmany(batch_size)
+        if not rows:
+            break
+        docs = []
+        for job_id, title, description, row_hash, old_term_ids in rows:
+            if old_term_ids:
+                df_changes.subtract(array("I", old_term_ids))
+            counts = job_terms(title, description)
+            for term in counts:
+                if term not in vocabulary:
+                    vocabulary[term] = conn.execute(
+                        "INSERT INTO rank_terms (term) VALUES (?)", (term,)).lastrowid
+            term_ids = array("I", (vocabulary[term] for term in counts))
+            df_changes.update(term_ids)
+            docs.append((job_id, row_hash, term_ids.tobytes(),
+                         array("I", counts.values()).tobytes()))
+        conn.executemany("INSERT OR REPLACE INTO rank_docs VALUES (?, ?, ?, ?)", docs)
+        count += len(rows)
+
+    conn.executemany("UPDATE rank_terms SET df = df + ? WHERE id = ?",
+                     ((change, term_id) for term_id, change in df_changes.items() if change))
+    if count:
+        conn.execute("UPDATE rank_meta SET value = value + 1 WHERE key = 'generation'")
+    conn.commit()
+    return count
+
+
+class RankingIndex:
+    """TF-IDF vectors of every indexed job, as a sparse jobs x terms matrix."""
+
+    def __init__(self, job_ids, matrix, vocabulary, idf):
+        self.job_ids = job_ids
+        self.matrix = matrix  # CSC, so selecting the query's term columns is cheap
+        self.vocabulary = vocabulary
+        self.idf = idf
+
+    @classmethod
+    def load(cls, db_name=DB_NAME):  # pylint: disable=too-many-locals
+        """Builds the matrix from the rank_docs and rank_terms tables."""
+        conn = get_connection(db_name)
+        vocabulary = dict(conn.execute("SELECT term, id FROM rank_terms"))
+        size = max(vocabulary.values(), default=0) + 1
+        df = np.zeros(size)
+        for term_id, term_df in conn.execute("SELECT id, df FROM rank_terms"):
+            df[term_id] = term_df
+
+        job_ids, indices, counts, indptr = [], array("I"), array("I"), [0]
+        for job_id, term_ids, term_counts in conn.execute(
+                "SELECT job_id, term_ids, counts FROM rank_docs ORDER BY job_id"):
+            job_ids.append(job_id)
+            indices.frombytes(term_ids)
+            counts.frombytes(term_counts)
+            indptr.append(len(indices))
+
+        idf = np.log((len(job_ids) + 1) / (df + 1)) + 1
+        indices = np.frombuffer(indices, dtype=np.uint32)
+        data = (1 + np.log(np.frombuffer(counts, dtype=np.uint32))) * idf[indices]
+        matrix = sparse.csr_matrix((data, indices, np.array(indptr)),
+                                   shape=(len(job_ids), size))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.diags(1 / norms) @ matrix
+        return cls(job_ids, matrix.tocsc(), vocabulary, idf)
+
+    def vectorize(self, text):
+        """Term IDs and unit-length TF-IDF weights of text. Unknown terms are left out."""
+        counts = Counter(term for term in tokenize(text) if term in self.vocabulary)
+        term_ids = np.array([self.vocabulary[term] for term in counts], dtype=np.int64)
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=float, count=len(counts)))) \
+            * self.idf[term_ids]
+        norm = np.linalg.norm(weights)
+        return term_ids, weights / norm if norm else weights
+
+    def top(self, text, k=DEFAULT_TOP_K):
+        """The k best matching (job_id, score) pairs for text, best first."""
+        term_ids, weights = self.vectorize(text)
+        if term_ids.size == 0 or not self.job_ids:
+            return []
+        scores = self.matrix[:, term_ids] @ weights
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.job_ids[i], float(scores[i])) for i in best]
+
+
+def get_index(db_name=DB_NAME):
+    """The ranking index for db_name, reloaded only after update_index changed it."""
+    create_ranking_tables(db_name)
+    generation = get_connection(db_name).execute(
+        "SELECT value FROM rank_meta WHERE key = 'generation'").fetchone()[0]
+    cached = _indexes.get(db_name)
+    if cached is None or cached[0] != generation:
+        cached = _indexes[db_name] = (generation, RankingIndex.load(db_name))
+    return cached[1]
+
+
+def rank_jobs(profile, k=DEFAULT_TOP_K, db_name=DB_NAME):
+    """
+    Finds the jobs that best match a user profile.
+    :param profile: Row from the user_profiles table.
+    :return: Up to k job dictionaries with id, title, company, location and score, best first.
+    """
+    ranked = get_index(db_name).top(profile_text(profile), k)
+    if not ranked:
+        return []
+    ids = [job_id for job_id, _ in ranked]
+    rows = get_connection(db_name).execute(
+        f"SELECT id, title, company, location FROM jobs WHERE id IN ({', '.join('?' * len(ids))})",
+        ids,
+    )
+    details = {row[0]: row for row in rows}
+    return [dict(zip(("id", "title", "company", "location"), details[job_id]), score=score)
+            for job_id, score in ranked if job_id in details]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank jobs for a saved profile.")
+    parser.add_argument("profile", help="name of a saved user profile")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--db", default=DB_NAME)
+    args = parser.parse_args()
+
+    print(f"indexed {update_index(args.db)} changed jobs")
+    user_profile = load_user_profile(args.profile, args.db)
+    if user_profile is None:
+        raise SystemExit(f"No saved profile named {args.profile!r}")
+    for job in rank_jobs(user_profile, args.top, args.db):
+        print(f"{job['score']:.3f}\t{job['id']}\t{job['title']}\t{job['company']}")
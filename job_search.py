@@ -0,0 +1,115 @@
+"""
+job_search.py
+
+Ranked, paginated job search shared by the GUI and the command line.
+Text queries go through the jobs_fts full-text index and are ranked with
+bm25; filters use the indexed columns of the jobs table, including
+annualized salary ranges.
+
+Run with: python job_search.py "python developer" --location "Boston, MA"
+"""
+
+import argparse
+import re
+
+from db_connection import get_connection
+from json_database import DB_NAME
+from salary_parser import parse_amount
+
+DEFAULT_PAGE_SIZE = 20
+FILTERS = {
+    "company": "j.company = ?",
+    "location": "j.location = ?",
+    "employment_type": "j.employment_type = ?",
+    "is_remote": "j.is_remote = ?",
+    "posted_after": "j.date_posted >= ?",
+    # Yearly pay; a job matches when its salary range reaches into the wanted range
+    "min_salary": "j.salary_max >= ?",
+    "max_salary": "j.salary_min <= ?",
+}
+# bm25 column weights for title, company and job_description
+RANK = "bm25(jobs_fts, 10.0, 5.0, 1.0)"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text):
+    """Turns free text into an FTS5 query that matches all of its words."""
+    return " ".join(f'"{token}"' for token in _TOKEN.findall(text.lower()))
+
+
+def _where_clause(filters):
+    """Builds the filter conditions and their parameters."""
+    conditions, params = [], []
+    for name, value in (filters or {}).items():
+        if name not in FILTERS:
+            raise ValueError(f"Unknown search filter: {name}")
+        if value is not None and value != "":
+            conditions.append(FILTERS[name])
+            params.append(value)
+    return conditions, params
+
+
+def search_jobs(query="", filters=None, page=1, page_size=DEFAULT_PAGE_SIZE, db_name=DB_NAME):
+    """
+    Searches jobs by text and filters.
+    :param query: Words to find in the title, company or description. Empty lists all jobs.
+    :param filters: Optional dictionary with keys from FILTERS.
+    :param page: 1-based page number.
+    :return: Dictionary with the total match count, page info and a list of job dictionaries.
+             Text searches are ordered by relevance, others by newest posting.
+    """
+    page = max(1, page)
+    conditions, params = _where_clause(filters)
+    match = build_match_query(query)
+
+    if match:
+        source = "jobs_fts JOIN jobs j ON j.rowid = jobs_fts.rowid"
+        conditions.insert(0, "jobs_fts MATCH ?")
+        params.insert(0, match)
+        score, order = f"-{RANK}", RANK
+    else:
+        source = "jobs j"
+        score, order = "NULL", "j.date_posted DESC, j.id"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = get_connection(db_name).cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {source} {where}", params)
+    total = cursor.fetchone()[0]
+    cursor.execute(
+        f"""
+        SELECT j.id, j.title, j.company, j.location, j.date_posted, {score}
+        FROM {source} {where}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+        """,
+        params + [page_size, (page - 1) * page_size],
+    )
+    keys = ("id", "title", "company", "location", "date_posted", "score")
+    return {
+        "total": total,
+        "page": page,
+        "pages": max(1, -(-total // page_size)),
+        "jobs": [dict(zip(keys, row)) for row in cursor.fetchall()],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the jobs database.")
+    parser.add_argument("query", nargs="?", default="", help="words to search for")
+    parser.add_argument("--db", default=DB_NAME, help="SQLite database to search")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--remote", dest="is_remote", action="store_const", const=True,
+                        help="only remote jobs")
+    for filter_name in FILTERS:
+        if filter_name != "is_remote":
+            parser.add_argument(f"--{filter_name.replace('_', '-')}", dest=filter_name,
+                                type=parse_amount if filter_name.endswith("salary") else str)
+    args = parser.parse_args()
+
+    result = search_jobs(args.query, {name: getattr(args, name) for name in FILTERS},
+                         args.page, args.page_size, args.db)
+    print(f"{result['total']} jobs, page {result['page']} of {result['pages']}")
+    for job in result["jobs"]:
+        print(f"{job['id']}\t{job['title']}\t{job['company']}\t{job['location']}")
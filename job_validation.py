@@ -0,0 +1,158 @@
+"""
+job_validation.py
+
+Validation stage for imports. Normalized rows are checked a batch at a
+time, one column at a time:
+- IDs must be present, and text or numbers.
+- Text fields must be text, salaries numbers and is_remote a boolean.
+- date_posted must be a valid ISO date or relative text like "2 days ago".
+
+Records that fail, and JSON that can't be parsed, go to the quarantine table
+with the reason, the feed file and their character offset in it. A bad
+record never stops or slows the rest of an import.
+json_database.replay_quarantine imports quarantined records again once the
+feed adapter, the validation or the stored record has been fixed.
+
+Run with: python job_validation.py
+          python job_validation.py --replay 12 13
+"""
+
+import argparse
+import json
+import re
+from datetime import datetime
+
+from db_connection import get_connection
+from feed_adapters import UNIFIED_FIELDS
+
+DB_NAME = "jobs.db"
+
+TEXT_FIELDS = ("title", "company", "location", "employment_type", "date_posted",
+               "salary_currency", "description", "job_url", "email", "salary_period")
+NUMBER_FIELDS = ("salary_min", "salary_max")
+FLAG_FIELDS = ("is_remote",)
+
+_ID = UNIFIED_FIELDS.index("id")
+_DATE = UNIFIED_FIELDS.index("date_posted")
+_ALLOWED_TYPES = {
+    **{field: frozenset((str, type(None))) for field in TEXT_FIELDS},
+    **{field: frozenset((int, float, type(None))) for field in NUMBER_FIELDS},
+    **{field: frozenset((bool, int, type(None))) for field in FLAG_FIELDS},
+}
+_ID_TYPES = frozenset((str, int))
+_ISO_DATE = re.compile(r"\d{4}-\d\d-\d\d")
+
+
+def create_quarantine_table(cursor):
+    """Creates the table holding records that failed validation."""
+    cursor.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS quarantine (
+            id INTEGER PRIMARY KEY,
+            file_path TEXT,
+            source TEXT,
+            record_offset INTEGER,
+            job_id TEXT,
+            reason TEXT,
+            record TEXT,
+            quarantined_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            replayed_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_quarantine_pending ON quarantine (replayed_at);
+        """
+    )
+
+
+def _valid_date(text):
+    """Whether an ISO-looking date such as "2024-01-15T10:00:00Z" is a real date."""
+    try:
+        datetime.fromisoformat(text)
+    except ValueError:
+        return False
+    return True
+
+
+def validate_rows(rows):  # pylint: disable=too-many-branches
+    """
+    Checks a batch of rows ordered like JOB_COLUMNS, column by column.
+    IDs repeated within a feed aren't errors: the import keeps the last one.
+    :return: {index in rows: reason} for every invalid row.
+    """
+    problems = {}
+    if not rows:
+        return problems
+    columns = list(zip(*rows))
+
+    ids = columns[_ID]
+    if not set(map(type, ids)) <= _ID_TYPES or "" in ids:
+        for index, value in enumerate(ids):
+            if value is None or value == "":
+                problems[index] = "Missing id"
+            elif type(value) not in _ID_TYPES:
+                problems[index] = f"id is a {type(value).__name__}, not text or a number"
+
+    for field, allowed in _ALLOWED_TYPES.items():
+        column = columns[UNIFIED_FIELDS.index(field)]
+        if set(map(type, column)) <= allowed:  # The usual case, checked without a Python loop
+            continue
+        for index in [index for index, value in enumerate(column) if type(value) not in allowed]:
+            problems.setdefault(index, f"{field} has the wrong type "
+                                       f"({type(column[index]).__name__})")
+
+    dates = columns[_DATE]
+    try:
+        distinct = set(dates)  # Feeds repeat the same few dates
+    except TypeError:  # An unhashable date, already reported above
+        distinct = dates
+    for value in distinct:
+        if isinstance(value, str) and _ISO_DATE.match(value) and not _valid_date(value):
+            for index, date in enumerate(dates):
+                if date == value:
+                    problems.setdefault(index, f"date_posted {value!r} is not a valid date")
+    return problems
+
+
+def quarantine_entry(file_path, source, offset, job_id, reason, record):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """A quarantine table row. record is a parsed record or the text that couldn't be parsed."""
+    if not isinstance(record, str):
+        record = json.dumps(record, default=str)
+    if job_id is not None and type(job_id) not in _ID_TYPES:
+        job_id = None
+    return file_path, source, offset, job_id, reason, record
+
+
+def write_quarantine(conn, entries):
+    """Writes quarantine_entry rows. The caller commits."""
+    conn.executemany(
+        "INSERT INTO quarantine (file_path, source, record_offset, job_id, reason, record) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        entries,
+    )
+
+
+def get_quarantine(db_name=DB_NAME, include_replayed=False, limit=100):
+    """The most recent quarantined records as dictionaries, without the records themselves."""
+    columns = ("id", "file_path", "source", "record_offset", "job_id", "reason",
+               "quarantined_at", "replayed_at")
+    where = "" if include_replayed else "WHERE replayed_at IS NULL"
+    rows = get_connection(db_name).execute(
+        f"SELECT {', '.join(columns)} FROM quarantine {where} ORDER BY id DESC LIMIT ?", (limit,))
+    return [dict(zip(columns, row)) for row in rows]
+
+
+if __name__ == "__main__":
+    from json_database import create_database, replay_quarantine  # pylint: disable=import-outside-toplevel,cyclic-import
+
+    parser = argparse.ArgumentParser(description="List or replay quarantined job records.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--replay", nargs="*", type=int, metavar="ID",
+                        help="replay these quarantine entries, or all pending ones")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    create_database(args.db)
+    if args.replay is not None:
+        print(replay_quarantine(args.db, args.replay or None))
+    for entry in get_quarantine(args.db, limit=args.limit):
+        print(f"{entry['id']}\t{entry['file_path']}@{entry['record_offset']}\t"
+              f"{entry['job_id']}\t{entry['reason']}")
@@ -6,18 +6,75 @@ It creates a jobs database, inserts job fields, and processes job listings
 from two JSON files.
 """
 
+import hashlib
+import itertools
 import sqlite3
 import json
+import time
+
+import metrics
+from db_connection import get_connection
+from feed_adapters import SAMPLE_SIZE, UNIFIED_FIELDS, detect_adapter, provider_url, sniff
+from job_validation import (
+    create_quarantine_table, quarantine_entry, validate_rows, write_quarantine
+)
 
 DB_NAME = "jobs.db"
 
+PAGE_SIZE = 100  # Rows per page of the job list
+
+# Columns the GUI and search API filter on
+INDEXED_COLUMNS = ("company", "location", "is_remote", "employment_type", "date_posted",
+                   "salary_min", "salary_max")
+
+# Columns added after the first release; create_database adds them to older databases
+TRACKING_COLUMNS = {
+    "content_hash": "TEXT",  # Hash of the imported fields, to skip unchanged jobs
+    "stale": "INTEGER DEFAULT 0",  # 1 once a job is missing from its source's feed
+    "salary_period": "TEXT",  # Pay period salary_min/salary_max were annualized from
+}
+
 
 # A.I. gave me the idea for dynamic database names.
 # This helped when setting up my automated tests.
 def create_database(db_name=DB_NAME):
     """Creates the specified database and jobs table if they don't exist."""
-    conn = sqlite3.connect(db_name)
+    conn = get_connection(db_name)
     cursor = conn.cursor()
+    if is_compact(cursor):
+        from compact_storage import add_columns  # pylint: disable=import-outside-toplevel,cyclic-import
+        add_columns(cursor, TRACKING_COLUMNS)
+    else:
+        _create_jobs_table(cursor)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT,
+            source TEXT,
+            finished_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            seconds REAL,
+            new INTEGER,
+            changed INTEGER,
+            unchanged INTEGER,
+            stale INTEGER,
+            revived INTEGER,
+            rejected INTEGER
+        )
+    """
+    )
+    create_quarantine_table(cursor)
+    conn.commit()
+
+
+def is_compact(cursor):
+    """True when jobs is the view over compact storage from compact_storage.py."""
+    cursor = cursor.execute("SELECT type FROM sqlite_master WHERE name = 'jobs'")
+    return cursor.fetchone() == ("view",)
+
+
+def _create_jobs_table(cursor):
+    """Creates the plain jobs table with its indexes and full-text index."""
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS jobs (
@@ -38,91 +95,677 @@ def create_database(db_name=DB_NAME):
         )
     """
     )
-    conn.commit()
-    conn.close()
+    existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(jobs)")}
+    for column, column_type in TRACKING_COLUMNS.items():
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+    for column in INDEXED_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_jobs_{column} ON jobs ({column})")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_source ON jobs (source)")
+    create_search_index(cursor)
+
+
+# Only edits to the indexed text re-index a job, not stale marking or other columns
+_FTS_UPDATE_TRIGGER = """
+        CREATE TRIGGER jobs_fts_update AFTER UPDATE OF title, company, job_description ON jobs
+        BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, title, company, job_description)
+            VALUES ('delete', old.rowid, old.title, old.company, old.job_description);
+            INSERT INTO jobs_fts (rowid, title, company, job_description)
+            VALUES (new.rowid, new.title, new.company, new.job_description);
+        END;
+"""
 
 
+def create_search_index(cursor):
+    """
+    Creates the jobs_fts full-text index over title, company and description.
+    Triggers keep it in sync with the jobs table, and an existing jobs table
+    is indexed once when the full-text table is first created.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'jobs_fts'")
+    if cursor.fetchone():
+        # Databases from before the update trigger was limited to the indexed columns
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+                       "AND name = 'jobs_fts_update' AND tbl_name = 'jobs'")
+        row = cursor.fetchone()
+        if row and "UPDATE OF" not in row[0]:
+            cursor.executescript(f"DROP TRIGGER jobs_fts_update; {_FTS_UPDATE_TRIGGER}")
+        return
+    cursor.executescript(
+        """
+        CREATE VIRTUAL TABLE jobs_fts USING fts5(
+            title, company, job_description,
+            content='jobs', content_rowid='rowid', tokenize='porter unicode61'
+        );
+        CREATE TRIGGER jobs_fts_insert AFTER INSERT ON jobs BEGIN
+            INSERT INTO jobs_fts (rowid, title, company, job_description)
+            VALUES (new.rowid, new.title, new.company, new.job_description);
+        END;
+        CREATE TRIGGER jobs_fts_delete AFTER DELETE ON jobs BEGIN
+            INSERT INTO jobs_fts (jobs_fts, rowid, title, company, job_description)
+            VALUES ('delete', old.rowid, old.title, old.company, old.job_description);
+        END;
+        """ + _FTS_UPDATE_TRIGGER + """
+        INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild');
+        """
+    )
+
+
+JOB_COLUMNS = (
+    "id", "title", "company", "location", "employment_type", "date_posted", "salary_min",
+    "salary_max", "salary_currency", "is_remote", "job_description", "job_url", "source", "email",
+    "salary_period",
+)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class JobStorage:  # pylint: disable=too-few-public-methods
+    """
+    Where job rows are written: the jobs table, or job_rows when the database
+    uses compact storage and jobs is a view. Rows ordered like JOB_COLUMNS go
+    through encode first, which interns and compresses them for job_rows.
+    """
+
+    def __init__(self, conn):
+        self.table, self.columns, self.encode = "jobs", JOB_COLUMNS, tuple
+        if is_compact(conn):
+            from compact_storage import CompactEncoder  # pylint: disable=import-outside-toplevel,cyclic-import
+            encoder = CompactEncoder(conn)
+            self.table, self.columns, self.encode = "job_rows", encoder.columns, encoder.encode
+        names, marks = ", ".join(self.columns), ", ".join("?" for _ in self.columns)
+        self.insert_sql = f"INSERT OR IGNORE INTO {self.table} ({names}) VALUES ({marks})"
+        # Imports with content hashes update an existing row first, then insert a new one
+        self.update_tracked_sql = (
+            f"UPDATE {self.table} SET {', '.join(f'{c} = ?' for c in self.columns[1:])}, "
+            f"content_hash = ?, stale = 0 WHERE id = ?"
+        )
+        self.insert_tracked_sql = (f"INSERT OR IGNORE INTO {self.table} "
+                                   f"({names}, content_hash, stale) VALUES ({marks}, ?, 0)")
+
+
+def job_row(job):
+    """Orders a unified job's fields to match JOB_COLUMNS."""
+    return tuple(map(job.get, UNIFIED_FIELDS))
+
+
+@metrics.timed("job_insert_seconds")
 def insert_job(job, db_name=DB_NAME):
     """Inserts a job into the specified database, with no duplicates."""
-    conn = sqlite3.connect(db_name)  # Use dynamic database name for testing
+    conn = get_connection(db_name)  # Use dynamic database name for testing
+    storage = JobStorage(conn)
+    conn.execute(storage.insert_sql, storage.encode(job_row(job)))
+    conn.commit()
+
+
+@metrics.timed("insert_batch_seconds")
+def _insert_batch(cursor, sql, rows, stats):
+    """Inserts one batch inside a savepoint, falling back to row by row on a bad value."""
+    cursor.execute("SAVEPOINT job_batch")
+    rejected = 0
+    try:
+        cursor.executemany(sql, rows)
+        inserted = cursor.rowcount
+    except sqlite3.Error:
+        # One bad row fails the whole executemany, so redo the batch one row at a
+        # time to keep the good rows and count only the bad ones as rejected.
+        cursor.execute("ROLLBACK TO job_batch")
+        inserted = 0
+        for row in rows:
+            try:
+                cursor.execute(sql, row)
+                inserted += cursor.rowcount
+            except sqlite3.Error:
+                rejected += 1
+    cursor.execute("RELEASE job_batch")
+    stats["inserted"] += inserted
+    stats["ignored"] += len(rows) - inserted - rejected
+    stats["rejected"] += rejected
+    metrics.increment("jobs_inserted_total", inserted)
+    metrics.increment("jobs_rejected_total", rejected)
+
+
+def insert_job_rows(conn, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Inserts job rows (ordered like JOB_COLUMNS) over one open connection using executemany.
+    Each batch of batch_size rows is committed in its own explicit transaction.
+    Rows without an id are rejected instead of being stored with a NULL key.
+    :return: Dictionary with counts of inserted, ignored and rejected rows.
+    """
+    stats = {"inserted": 0, "ignored": 0, "rejected": 0}
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Manage transactions explicitly
     cursor = conn.cursor()
-    cursor.execute(
+    storage = JobStorage(conn)
+    batch = []
+
+    def flush():
+        cursor.execute("BEGIN")
+        try:
+            _insert_batch(cursor, storage.insert_sql, batch, stats)
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+        batch.clear()
+
+    try:
+        for row in rows:
+            if not row[0]:
+                stats["rejected"] += 1
+                continue
+            batch.append(storage.encode(row))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        conn.isolation_level = isolation_level
+    return stats
+
+
+def insert_jobs(conn, jobs, batch_size=DEFAULT_BATCH_SIZE):
+    """Inserts unified jobs with insert_job_rows. Returns the same counts."""
+    return insert_job_rows(conn, map(job_row, jobs), batch_size)
+
+
+class _JsonStream:
+    """Buffered reader that decodes one JSON value at a time from a text file."""
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.start = 0  # Offset in the file of the buffer's first character
+        self.eof = False
+
+    @property
+    def offset(self):
+        """Character offset of the current position in the file."""
+        return self.start + self.pos
+
+    def fill(self, size=None):
+        """Drops the consumed part of the buffer and reads more text. False at end of file."""
+        chunk = self.file.read(size or self.chunk_size)
+        self.start += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or None at end of file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def decode(self):
+        """Decodes the value at the current position, reading more text until it's complete."""
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer can be fixed by reading more
+                truncated = e.pos >= len(self.buffer) - 6 or e.msg.startswith("Unterminated")
+                # Grow reads with the pending text so huge records aren't rescanned per chunk
+                if not truncated or self.eof \
+                        or not self.fill(max(self.chunk_size, len(self.buffer) - self.pos)):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not isinstance(value, (dict, list, str)) \
+                    and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip_line(self):
+        """Skips past the next newline to recover from invalid JSON. Returns the skipped text."""
+        skipped = []
+        while True:
+            newline = self.buffer.find("\n", self.pos)
+            if newline != -1:
+                skipped.append(self.buffer[self.pos:newline])
+                self.pos = newline + 1
+                return "".join(skipped)
+            skipped.append(self.buffer[self.pos:])
+            self.pos = len(self.buffer)
+            if not self.fill():
+                return "".join(skipped)
+
+    def skip_element(self):
         """
-        INSERT OR IGNORE INTO jobs (
-            id, title, company, location, employment_type, date_posted, salary_min,
-            salary_max, salary_currency, is_remote, job_description, job_url, source, email
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """,
-        (
-            job.get("id"),
-            job.get("title"),
-            job.get("company"),
-            job.get("location"),
-            job.get("employment_type"),
-            job.get("date_posted"),
-            job.get("salary_min"),
-            job.get("salary_max"),
-            job.get("salary_currency"),
-            job.get("is_remote"),
-            job.get("description"),
-            job.get("job_url"),
-            job.get("source"),
-            job.get("email"),
-        ),
-    )
-    conn.commit()
-    conn.close()
+        Skips the rest of an invalid array element, up to the comma or closing
+        bracket that ends it outside any string or nested value, so the next
+        element can still be read. Returns the skipped text.
+        """
+        skipped = []
+        depth = 0
+        in_string = escaped = False
+        while True:
+            for index in range(self.pos, len(self.buffer)):
+                char = self.buffer[index]
+                if escaped:
+                    escaped = False
+                elif in_string:
+                    escaped = char == "\\"
+                    in_string = char != '"'
+                elif char == '"':
+                    in_string = True
+                elif char in "[{":
+                    depth += 1
+                elif depth:
+                    if char in "]}":
+                        depth -= 1
+                elif char in ",]":
+                    skipped.append(self.buffer[self.pos:index])
+                    self.pos = index
+                    return "".join(skipped)
+            skipped.append(self.buffer[self.pos:])
+            self.pos = len(self.buffer)
+            if not self.fill():
+                return "".join(skipped)
+
+
+_DECODER = json.JSONDecoder()
+READ_CHUNK_SIZE = 1 << 16
 
 
-def import_json_data(file_path, source, db_name=DB_NAME):
-    """Reads job listings from a JSON file and inserts them into the specified database."""
-    extracted_jobs = []
+def _iter_array(stream, on_invalid):
+    """
+    Yields (offset, element) pairs of a top-level array one by one, after its
+    opening bracket. An invalid element is passed to on_invalid with
+    (offset, error message, its text) and reading goes on with the next one.
+    """
+    stream.pos += 1
+    while True:
+        char = stream.peek()
+        if char is None:
+            raise json.JSONDecodeError("Unterminated array", stream.buffer, stream.pos)
+        if char == "]":
+            stream.pos += 1
+            return
+        if char == ",":
+            stream.pos += 1
+            continue
+        offset = stream.offset
+        try:
+            value = stream.decode()
+        except json.JSONDecodeError as e:
+            on_invalid(offset, e.msg, stream.skip_element())
+            if stream.peek() is None:  # The element ran to the end of the file
+                return
+            continue
+        yield offset, value
+
+
+def iter_json_entries(file_path, chunk_size=READ_CHUNK_SIZE, on_error=None):
+    """
+    Yields (offset, job object) pairs from a JSON file one at a time without
+    loading the whole file, where offset is the object's character offset in
+    the file. Handles top-level arrays (one or many, like rapid_jobs2.json),
+    JSON Lines and concatenated objects. Invalid JSON is skipped up to the next
+    array element, or the next line outside an array, and values that aren't
+    objects are skipped.
+    :param on_error: Called with (offset, reason, skipped text) for each skip.
+                     Without it, invalid JSON is reported and other values ignored.
+    """
+    def invalid(offset, message, text):
+        if on_error:
+            on_error(offset, f"Invalid JSON: {message}", text)
+        else:
+            print(f"Skipping invalid JSON in {file_path} at offset {offset}: {message}")
 
     with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
+        stream = _JsonStream(f, chunk_size)
+        while True:
+            char = stream.peek()
+            if char is None:
+                return
+            offset = stream.offset
             try:
-                job_data = json.loads(line.strip())
-                # A.I. was used to pinpoint the differences in the file formats
-                # This helped me program accordingly
-                if isinstance(job_data, list):  # List of jobs
-                    for job in job_data:
-                        transformed_job = unify_job_data(job, source)
-                        extracted_jobs.append(transformed_job)
-                        insert_job(
-                            transformed_job, db_name
-                        )  # Insert into the specified database
-
-                elif isinstance(job_data, dict):  # Single job
-                    transformed_job = unify_job_data(job_data, source)
-                    extracted_jobs.append(transformed_job)
-                    insert_job(
-                        transformed_job, db_name
-                    )  # Insert into the specified database
-
+                values = (_iter_array(stream, invalid) if char == "["
+                          else ((offset, stream.decode()),))
+                for offset, value in values:
+                    if isinstance(value, dict):
+                        yield offset, value
+                    elif on_error:
+                        on_error(offset, "Not a JSON object", json.dumps(value))
             except json.JSONDecodeError as e:
-                print(f"Skipping invalid JSON line in {file_path}: {e}")
+                invalid(stream.offset, e.msg, stream.skip_line())
 
-    return extracted_jobs  # Used only for testing
+
+def iter_json_records(file_path, chunk_size=READ_CHUNK_SIZE):
+    """Yields the job objects of a JSON file one at a time, like iter_json_entries."""
+    for _, record in iter_json_entries(file_path, chunk_size):
+        yield record
+
+
+def _normalize_each(batch, normalize, source, reject, file_path):
+    """
+    Normalizes a batch one record at a time, after normalizing it as a whole
+    raised. Each record that raises is passed to reject as a quarantine_entry.
+    :return: The batch and rows of the records that normalized.
+    """
+    kept, rows = [], []
+    for offset, record in batch:
+        try:
+            rows.append(normalize(record, source))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            reject(quarantine_entry(file_path, source, offset, record.get("id"),
+                                    f"{type(e).__name__}: {e}", record))
+            continue
+        kept.append((offset, record))
+    return kept, rows
+
+
+def iter_job_rows(file_path, source, quarantined=None, batch_size=DEFAULT_BATCH_SIZE):  # pylint: disable=too-many-locals
+    """
+    Generator pipeline of valid rows ordered like JOB_COLUMNS from a JSON file.
+    Records go through the feed adapter named source, or the one detected
+    from the first records when no adapter has that name, and are validated
+    batch_size at a time. Invalid records and JSON are left out.
+    :param quarantined: List receiving a quarantine_entry for each record left out.
+    """
+    quarantined = [] if quarantined is None else quarantined
+
+    def skip(offset, reason, text):
+        quarantined.append(quarantine_entry(file_path, source, offset, None, reason, text))
+
+    entries = iter_json_entries(file_path, on_error=skip)
+    sample = list(itertools.islice(entries, SAMPLE_SIZE))
+    adapter = sniff([record for _, record in sample], source)[0]
+    source = source or adapter.name
+    normalize = adapter.row
+    entries = itertools.chain(sample, entries)
+    while batch := list(itertools.islice(entries, batch_size)):
+        try:
+            rows = [normalize(record, source) for _, record in batch]
+        except Exception:  # pylint: disable=broad-exception-caught
+            batch, rows = _normalize_each(batch, normalize, source, quarantined.append, file_path)
+        problems = validate_rows(rows)
+        if problems:
+            for index, reason in problems.items():
+                offset, record = batch[index]
+                quarantined.append(
+                    quarantine_entry(file_path, source, offset, rows[index][0], reason, record))
+            rows = [row for index, row in enumerate(rows) if index not in problems]
+        yield from rows
+
+
+def iter_unified_jobs(file_path, source, quarantined=None):
+    """Generator pipeline of valid jobs from a JSON file in the unified schema."""
+    return (dict(zip(UNIFIED_FIELDS, row))
+            for row in iter_job_rows(file_path, source, quarantined))
+
+
+def _flush_quarantine(conn, quarantined):
+    """Writes the quarantine entries collected so far in one transaction and clears them."""
+    if not quarantined:
+        return
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    write_quarantine(conn, quarantined)
+    conn.commit()
+    metrics.increment("jobs_quarantined_total", len(quarantined))
+    quarantined.clear()
+
+
+@metrics.timed("json_import_seconds")
+def import_json_data(file_path, source, db_name=DB_NAME, collect=False):
+    """
+    Reads job listings from a JSON file and inserts them into the specified database.
+    :param collect: Keep and return the unified jobs, otherwise nothing is held in memory.
+    :return: List of the unified jobs when collect is True, otherwise None.
+    """
+    extracted_jobs = [] if collect else None
+    quarantined = []
+
+    for transformed_job in iter_unified_jobs(file_path, source, quarantined):
+        if collect:
+            extracted_jobs.append(transformed_job)
+        insert_job(transformed_job, db_name)  # Insert into the specified database
+
+    _flush_quarantine(get_connection(db_name), quarantined)
+    return extracted_jobs
+
+
+@metrics.timed("bulk_import_seconds")
+def bulk_import_json_data(file_path, source, db_name=DB_NAME, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Imports a JSON file like import_json_data, but over a single connection
+    with batched inserts instead of one connection and commit per job.
+    :return: Dictionary with counts of inserted, ignored and rejected rows.
+             Quarantined records count as rejected.
+    """
+    conn = get_connection(db_name)
+    quarantined = []
+    stats = insert_job_rows(conn, iter_job_rows(file_path, source, quarantined, batch_size),
+                            batch_size)
+    stats["rejected"] += len(quarantined)
+    _flush_quarantine(conn, quarantined)
+    return stats
+
+
+DELTA_FIELDS = ("new", "changed", "unchanged", "stale", "revived", "rejected")
+
+
+def content_hash(row):
+    """Hashes a job row's fields so an unchanged job can be recognized on the next import."""
+    text = "\x1f".join(map(str, row))  # Much cheaper than repr() for long descriptions
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _update_params(row):
+    """Moves a row's ID to the end, where update_tracked_sql expects it."""
+    return (*row[1:], row[0])
+
+
+@metrics.timed("upsert_batch_seconds")
+def _upsert_batch(cursor, storage, batch, delta):
+    """
+    Upserts (row, kind) pairs in one transaction, where kind is "new" or "changed"
+    and row is an encoded row followed by its content hash.
+    A row SQLite refuses is counted as rejected instead of kind.
+    """
+    cursor.execute("BEGIN")
+    try:
+        try:
+            cursor.execute("SAVEPOINT job_batch")
+            rows = [row for row, _ in batch]
+            cursor.executemany(storage.update_tracked_sql, map(_update_params, rows))
+            cursor.executemany(storage.insert_tracked_sql, rows)
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK TO job_batch")
+            for row, kind in batch:
+                try:
+                    cursor.execute(storage.update_tracked_sql, _update_params(row))
+                    cursor.execute(storage.insert_tracked_sql, row)
+                except sqlite3.Error:
+                    delta[kind] -= 1
+                    delta["rejected"] += 1
+        cursor.execute("RELEASE job_batch")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+    batch.clear()
+
+
+def _finish_import(cursor, storage, feed, delta, stale_ids, revived_ids):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """
+    Marks missing jobs stale, revives returning ones and records the run in import_runs.
+    :param feed: (file_path, source) of the imported feed.
+    """
+    update = f"UPDATE {storage.table} SET stale = ? WHERE id = ?"
+    cursor.execute("BEGIN")
+    try:
+        cursor.executemany(update, ((1, i) for i in stale_ids))
+        cursor.executemany(update, ((0, i) for i in revived_ids))
+        cursor.execute(
+            f"INSERT INTO import_runs (file_path, source, seconds, {', '.join(DELTA_FIELDS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' for _ in DELTA_FIELDS)})",
+            (*feed, delta["seconds"], *(delta[field] for field in DELTA_FIELDS)),
+        )
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+
+
+def incremental_import_json_data(file_path, source, db_name=DB_NAME,  # pylint: disable=too-many-locals
+                                 batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Re-imports a feed, writing only what changed since the last import.
+    The stored hash of every job from this source is loaded first, so unchanged
+    jobs are skipped without touching the database. New and changed jobs are
+    upserted, jobs of this source missing from the file are marked stale, and
+    stale jobs that are back in the file are revived.
+    Invalid records are quarantined and counted as rejected.
+    :return: Delta report counting new, changed, unchanged, stale, revived and
+             rejected jobs plus the seconds taken, also saved in import_runs.
+    """
+    start = time.perf_counter()
+    create_database(db_name)
+    conn = get_connection(db_name)
+    known = {job_id: (row_hash, stale) for job_id, row_hash, stale in conn.execute(
+        "SELECT id, content_hash, stale FROM jobs WHERE source = ?", (source,))}
+    delta = dict.fromkeys(DELTA_FIELDS, 0)
+    seen = set()
+    revived = []
+    batch = []
+    quarantined = []
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Manage transactions explicitly
+    cursor = conn.cursor()
+    storage = JobStorage(conn)
+    try:
+        for row in iter_job_rows(file_path, source, quarantined, batch_size):
+            row_hash = content_hash(row)
+            seen.add(row[0])
+            previous = known.get(row[0])
+            if previous and previous[0] == row_hash:
+                delta["unchanged"] += 1
+                if previous[1]:
+                    revived.append(row[0])
+                continue
+            kind = "changed" if previous else "new"
+            delta[kind] += 1
+            known[row[0]] = (row_hash, 0)
+            batch.append(((*storage.encode(row), row_hash), kind))
+            if len(batch) >= batch_size:
+                _upsert_batch(cursor, storage, batch, delta)
+            if len(quarantined) >= batch_size:
+                delta["rejected"] += len(quarantined)
+                _flush_quarantine(conn, quarantined)
+        if batch:
+            _upsert_batch(cursor, storage, batch, delta)
+        delta["rejected"] += len(quarantined)
+        _flush_quarantine(conn, quarantined)
+
+        stale = [job_id for job_id, (_, was_stale) in known.items()
+                 if job_id not in seen and not was_stale]
+        delta["stale"], delta["revived"] = len(stale), len(revived)
+        delta["seconds"] = round(time.perf_counter() - start, 3)
+        metrics.observe("incremental_import_seconds", time.perf_counter() - start)
+        for field in DELTA_FIELDS:
+            metrics.increment(f"import_{field}_jobs_total", delta[field])
+        _finish_import(cursor, storage, (file_path, source), delta, stale, revived)
+    finally:
+        conn.isolation_level = isolation_level
+    return delta
+
+
+def _quarantined_records(text):
+    """
+    Job objects in a quarantined record: one object, or the rest of an array
+    line after the record that failed, with or without its brackets.
+    """
+    body = text.strip()
+    body = body[1:] if body.startswith("[") else body
+    body = body[:-1] if body.endswith("]") else body
+    records = json.loads(f"[{body}]")
+    if not records or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Not a JSON object")
+    return records
+
+
+def replay_quarantine(db_name=DB_NAME, entry_ids=None, batch_size=DEFAULT_BATCH_SIZE):  # pylint: disable=too-many-locals
+    """
+    Imports quarantined records again, after the feed adapter, the validation or
+    the stored record (quarantine.record) has been fixed. Records that are valid
+    now are upserted like an incremental import and their entries marked
+    replayed. The others stay quarantined with the new reason.
+    :param entry_ids: Quarantine IDs to replay, or None for every pending entry.
+    :return: Dictionary counting replayed entries, entries still quarantined and jobs written.
+    """
+    create_database(db_name)
+    conn = get_connection(db_name)
+    query = "SELECT id, source, record FROM quarantine WHERE replayed_at IS NULL"
+    if entry_ids is not None:
+        query += f" AND id IN ({', '.join('?' * len(entry_ids))})"
+    entries = conn.execute(query + " ORDER BY id", tuple(entry_ids or ())).fetchall()
+    result = {"replayed": 0, "quarantined": 0, "jobs": 0}
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # Manage transactions explicitly
+    cursor = conn.cursor()
+    storage = JobStorage(conn)
+    try:
+        for start in range(0, len(entries), batch_size):
+            batch, replayed, failed = [], [], []
+            for entry_id, source, text in entries[start:start + batch_size]:
+                try:
+                    records = _quarantined_records(text)
+                except json.JSONDecodeError as e:
+                    failed.append((f"Invalid JSON: {e.msg}", entry_id))
+                    continue
+                except ValueError as e:
+                    failed.append((str(e), entry_id))
+                    continue
+                adapter = sniff(records, source)[0]
+                try:
+                    rows = [adapter.row(record, source or adapter.name) for record in records]
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    failed.append((f"{type(e).__name__}: {e}", entry_id))
+                    continue
+                problems = validate_rows(rows)
+                if problems:
+                    failed.append((next(iter(problems.values())), entry_id))
+                    continue
+                batch += [((*storage.encode(row), content_hash(row)), "changed") for row in rows]
+                replayed.append((entry_id,))
+            delta = {"changed": len(batch), "rejected": 0}
+            if batch:
+                _upsert_batch(cursor, storage, batch, delta)
+            cursor.execute("BEGIN")
+            cursor.executemany(
+                "UPDATE quarantine SET replayed_at = CURRENT_TIMESTAMP WHERE id = ?", replayed)
+            cursor.executemany("UPDATE quarantine SET reason = ? WHERE id = ?", failed)
+            cursor.execute("COMMIT")
+            result["replayed"] += len(replayed)
+            result["quarantined"] += len(failed)
+            result["jobs"] += delta["changed"]
+    finally:
+        conn.isolation_level = isolation_level
+    return result
 
 
 def unify_job_data(job, source):
     """Transforms job data into the unified schema to utilize one table."""
-    return {
-        "id": job.get("id"),
-        "title": job.get("title"),
-        "company": job.get("company"),
-        "location": job.get("location"),
-        "employment_type": job.get("employmentType") or job.get("job_type"),
-        "date_posted": job.get("datePosted") or job.get("date_posted"),
-        "salary_min": job.get("min_amount"),
-        "salary_max": job.get("max_amount"),
-        "salary_currency": job.get("currency"),
-        "is_remote": job.get("is_remote", False),
-        "description": job.get("description"),
-        "job_url": get_job_url(job),
-        "source": source,
-        "email": job.get("emails"),
-    }
+    return sniff([job], source)[0].unify(job, source)
+
+
+def detect_source(job):
+    """Guesses which feed adapter a raw job belongs to, like "file1" (rapid_jobs2) or "file2"."""
+    return detect_adapter([job]).name
 
 
 def get_job_url(job):
@@ -130,18 +773,56 @@ def get_job_url(job):
     # A.I. was used to show me handling different URL formats
     if "job_url" in job:
         return job["job_url"]
-    if (
-            "jobProviders" in job
-            and isinstance(job["jobProviders"], list)
-            and len(job["jobProviders"]) > 0
-    ):
-        return job["jobProviders"][0].get("url")
-    return None
+    return provider_url(job.get("jobProviders"))
+
+
+def get_jobs(db_name=DB_NAME):
+    """gets job listings from the database."""
+    cursor = get_connection(db_name).cursor()
+    cursor.execute("SELECT id, title, company, location FROM jobs")
+    return cursor.fetchall()
 
 
-def create_user_profiles_table():
+def get_jobs_page(after_id=None, limit=PAGE_SIZE, db_name=DB_NAME):
+    """
+    gets one page of job listings ordered by ID, starting after after_id.
+    Keyset pagination seeks straight to the page through the primary key index
+    instead of reading and skipping every earlier row.
+    """
+    cursor = get_connection(db_name).cursor()
+    if after_id is None:
+        cursor.execute("SELECT id, title, company, location FROM jobs ORDER BY id LIMIT ?",
+                       (limit,))
+    else:
+        cursor.execute(
+            "SELECT id, title, company, location FROM jobs WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)
+        )
+    return cursor.fetchall()
+
+
+def get_job_info(job_id, db_name=DB_NAME):
+    """gets job details from the database for a job ID."""
+    cursor = get_connection(db_name).cursor()
+    cursor.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
+    return cursor.fetchone()
+
+
+def get_job_for_generation(job_id, db_name=DB_NAME):
+    """gets the job fields used in document prompts, or None if the job doesn't exist."""
+    job = get_job_info(job_id, db_name)
+    if job is None:
+        return None
+    return {"id": job[0], "title": job[1], "company": job[2], "location": job[3],
+            "description": job[10]}
+
+
+USER_PROFILE_COLUMNS = ("name", "email", "phone", "github_linkedin", "projects", "classes", "other")
+
+
+def create_user_profiles_table(db_name=DB_NAME):
     """Creates the user_profiles table if it doesn't exist."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection(db_name)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_profiles (
@@ -156,4 +837,29 @@ def create_user_profiles_table():
         )
     ''')
     conn.commit()
-    conn.close()
+
+
+def save_user_profile(profile, db_name=DB_NAME):
+    """Saves a profile dictionary with USER_PROFILE_COLUMNS keys, replacing one of the same name."""
+    create_user_profiles_table(db_name)
+    conn = get_connection(db_name)
+    conn.execute(
+        f"INSERT OR REPLACE INTO user_profiles ({', '.join(USER_PROFILE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in USER_PROFILE_COLUMNS)})",
+        tuple(profile.get(column, "") for column in USER_PROFILE_COLUMNS),
+    )
+    conn.commit()
+
+
+def get_user_profiles(db_name=DB_NAME):
+    """gets the list of saved user profiles from jobs.db."""
+    cursor = get_connection(db_name).cursor()
+    cursor.execute("SELECT name FROM user_profiles")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def load_user_profile(selected_name, db_name=DB_NAME):
+    """gets a user's saved profile info when a profile is chosen."""
+    cursor = get_connection(db_name).cursor()
+    cursor.execute("SELECT * FROM user_profiles WHERE name=?", (selected_name,))
+    return cursor.fetchone()
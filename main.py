@@ -23,53 +23,138 @@ This program reads a job description, personal description, and generates a resu
 then saves the response to a file.
 """
 
+import collections
+import functools
 import os
-import google.generativeai as genai
-import markdown
-from xhtml2pdf import pisa
-from json_database import create_database, import_json_data
-
-with open("secret.txt", "r", encoding="utf-8") as api_file:
-    api_key = api_file.read().strip()
-
-genai.configure(api_key=api_key)
-
-# altered from python dictionary to resolve error
-generation_config = genai.types.GenerationConfig(
-    temperature=1,
-    top_p=0.95,
-    top_k=40,
-    max_output_tokens=8192,
-    response_mime_type="text/plain",
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+from document_cache import DocumentCache, cache_key
+from json_database import create_database, incremental_import_json_data
+from job_dedup import find_duplicates
+from prompt_templates import (
+    DESCRIPTION_TOKEN_BUDGET, estimate_tokens, get_template, render_prompt
 )
 
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-exp",
-    generation_config=generation_config,
-)
+# The Gemini client, markdown and xhtml2pdf are slow to import, so they are
+# only loaded the first time a document is generated. Importing this module
+# for the JSON importer or the GUI stays cheap.
+MODEL_NAME = "gemini-2.0-flash-exp"
+GENERATION_CONFIG = {
+    "temperature": 1,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_mime_type": "text/plain",
+}
+
+
+# Generated documents, keyed by prompt, model and generation config
+document_cache = DocumentCache()
+
+# Latency of recent model requests, to compare streamed and blocking generation
+latency_log = collections.deque(maxlen=100)
+
+# Page setup and fonts for every generated PDF
+DOCUMENT_CSS = """
+@page { size: letter; margin: 2cm; }
+body { font-family: Helvetica; font-size: 10.5pt; line-height: 1.3; }
+h1 { font-size: 18pt; margin-bottom: 4pt; }
+h2 { font-size: 13pt; margin-top: 10pt; margin-bottom: 4pt; }
+h3 { font-size: 11pt; margin-bottom: 2pt; }
+"""
 
-chat_session = model.start_chat(history=[])
 
+@functools.lru_cache(maxsize=None)
+def get_model():
+    """
+    Configures Gemini with the key in secret.txt and creates the model on first use.
+    GEMINI_API_KEY overrides the key file, and GEMINI_API_ENDPOINT sends requests to
+    another server over REST, such as the local fake in fake_model.py.
+    """
+    import google.generativeai as genai  # pylint: disable=import-outside-toplevel
 
-def create_resume(job_desc: str, personal_desc: str) -> str:
-    """Creates a resume using AI based on job and personal descriptions."""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        with open("secret.txt", "r", encoding="utf-8") as api_file:
+            api_key = api_file.read().strip()
+
+    endpoint = os.environ.get("GEMINI_API_ENDPOINT")
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest",
+                        client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
+
+    # altered from python dictionary to resolve error
+    generation_config = genai.types.GenerationConfig(**GENERATION_CONFIG)
 
-    prompt = f"""
-    You are a professional resume creator. Create a sample resume in markdown format that will be designed for the
-    skills and job description provided.
+    return genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        generation_config=generation_config,
+    )
 
-    Job Description:
-    {job_desc}
 
-    Personal Description:
-    {personal_desc}
+def __getattr__(name):
+    """Creates main.model lazily when it's first accessed."""
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    Format the resume in a structured, professional way.
-    Do not include any additional information like suggestions. 
+
+def generate_text(prompt):
+    """
+    Sends one prompt to Gemini as an independent request and returns the text.
+    No chat history is kept between requests, so each one uploads only its own
+    prompt and documents for different users never share context.
+    """
+    start = time.perf_counter()
+    text = get_model().generate_content(prompt).text
+    elapsed = time.perf_counter() - start
+    metrics.observe("model_request_seconds", elapsed)
+    # Nothing is shown until the whole response is in, so the first token is the last one
+    latency_log.append({"mode": "blocking", "first_token": elapsed, "total": elapsed,
+                        "prompt_tokens": estimate_tokens(prompt)})
+    return text
+
+
+def stream_text(prompt, on_chunk):
+    """
+    Sends one prompt to Gemini and reads the response as it is generated.
+    :param on_chunk: Called with the text received so far after every chunk.
+    :return: The complete text.
     """
+    start = time.perf_counter()
+    first_token = None
+    text = ""
+    for chunk in get_model().generate_content(prompt, stream=True):
+        if not chunk.parts:  # The final chunk can carry only the finish reason
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        text += chunk.text
+        on_chunk(text)
+    total = time.perf_counter() - start
+    metrics.observe("model_request_seconds", total)
+    if first_token is not None:
+        metrics.observe("model_first_token_seconds", first_token)
+    latency_log.append({"mode": "stream", "first_token": total if first_token is None
+                        else first_token, "total": total, "prompt_tokens": estimate_tokens(prompt)})
+    return text
 
-    response = chat_session.send_message(prompt)
-    return response.text
+
+def create_resume(job_desc: str, personal_desc: str) -> str:
+    """Creates a resume using AI based on job and personal descriptions."""
+
+    prompt = get_template("create_resume").render(
+        {"job_desc": job_desc, "personal_desc": personal_desc}
+    )
+
+    return generate_text(prompt)
 
 
 def save_resume(resume_output: str) -> None:
@@ -84,118 +169,164 @@ def save_resume(resume_output: str) -> None:
     print(f"Resume saved to: {file_path}")
 
 
-# pylint: disable=too-many-locals
+@functools.lru_cache(maxsize=None)
+def _pdf_toolkit():
+    """
+    Imports markdown and xhtml2pdf and builds the HTML page around DOCUMENT_CSS,
+    once per process. Render pool workers call this when they start.
+    """
+    import markdown  # pylint: disable=import-outside-toplevel
+    from xhtml2pdf import pisa  # pylint: disable=import-outside-toplevel
+
+    head = f'<html><head><meta charset="utf-8"><style>{DOCUMENT_CSS}</style></head><body>'
+    return markdown, pisa, head, "</body></html>"
+
+
+_converters = threading.local()
+
+
+def render_pdf(markdown_text, pdf_path):
+    """Converts markdown to HTML and writes it to pdf_path as a PDF with xhtml2pdf."""
+    markdown, pisa, head, tail = _pdf_toolkit()
+    # Markdown converters aren't thread-safe, so each thread reuses its own
+    converter = getattr(_converters, "converter", None)
+    if converter is None:
+        converter = _converters.converter = markdown.Markdown()
+    # I used this method due to macOS issues for pdf conversions
+    with metrics.timer("markdown_seconds"):
+        html_content = head + converter.reset().convert(markdown_text) + tail
+    with open(pdf_path, "wb") as pdf_file, metrics.timer("pdf_render_seconds"):
+        pisa.CreatePDF(html_content, dest=pdf_file, encoding="utf-8")
+    return pdf_path
+
+
+class PdfRenderer:
+    """Renders PDFs with xhtml2pdf in the calling thread. This is the default renderer."""
+
+    def render(self, markdown_text, pdf_path):
+        """Writes markdown_text to pdf_path as a PDF and returns the path."""
+        return render_pdf(markdown_text, pdf_path)
+
+    def close(self):
+        """Releases anything the renderer holds. Nothing for this one."""
+
 
-def generate_resume_and_cover_letter(user_data, job_data, doc_type):
+class ProcessPoolRenderer(PdfRenderer):
+    """
+    Renders PDFs in worker processes. xhtml2pdf holds the GIL while it renders,
+    so this is what lets batch generation render several documents at once.
+    """
+
+    def __init__(self, workers=None):
+        self.executor = ProcessPoolExecutor(workers, initializer=_pdf_toolkit)
+
+    def submit(self, markdown_text, pdf_path):
+        """Starts a render and returns its future."""
+        return self.executor.submit(render_pdf, markdown_text, pdf_path)
+
+    def render(self, markdown_text, pdf_path):
+        return self.submit(markdown_text, pdf_path).result()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+RENDERERS = {"xhtml2pdf": PdfRenderer, "process-pool": ProcessPoolRenderer}
+pdf_renderer = PdfRenderer()
+
+
+def set_pdf_renderer(renderer):
+    """Makes generate_resume_and_cover_letter use renderer and returns the previous one."""
+    global pdf_renderer  # pylint: disable=global-statement
+    previous, pdf_renderer = pdf_renderer, renderer
+    return previous
+
+
+def document_key(user_data, job_data, doc_type, description_budget=DESCRIPTION_TOKEN_BUDGET):
+    """
+    The prompt for a document and its cache key, which changes whenever the
+    profile, the job, the template, the model or the generation config does.
+    """
+    prompt = render_prompt(doc_type, user_data, job_data, description_budget)
+    return prompt, cache_key(prompt, MODEL_NAME, GENERATION_CONFIG)
+
+
+def job_output_path(name, job_id, doc_type):
+    """generated_pdfs/{name}_{job id}_{doc_type}.pdf, so jobs never share a file."""
+    safe = [re.sub(r"[^\w.-]+", "_", str(part)).strip(".") or "_" for part in (name, job_id)]
+    return os.path.join("generated_pdfs", f"{safe[0]}_{safe[1]}_{doc_type}.pdf")
+
+
+def _write_pdf(pdf_filename, write):
+    """
+    Calls write with a temporary file next to pdf_filename and moves it into
+    place after, so generations running at once never write to the same file.
+    """
+    fd, temp_path = tempfile.mkstemp(".pdf.tmp", dir=os.path.dirname(pdf_filename) or ".")
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, pdf_filename)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return pdf_filename
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+
+@metrics.timed("document_generation_seconds")
+def generate_resume_and_cover_letter(user_data, job_data, doc_type, regenerate=False,
+                                     output_path=None, on_chunk=None,
+                                     description_budget=DESCRIPTION_TOKEN_BUDGET):
     """
     Generates a resume or cover letter using Gemini AI and saves it as a PDF.
+    A document generated before from the same prompt is copied from document_cache.
     :param user_data: Dictionary containing user information.
     :param job_data: Dictionary containing job details.
     :param doc_type: "resume" or "cover_letter" to specify document type.
+    :param regenerate: Skip the cache and always ask the model.
+    :param output_path: Where to write the PDF, generated_pdfs/{name}_{doc_type}.pdf by default.
+    :param on_chunk: Streams the response and calls this with the markdown received so far.
+    :param description_budget: Most tokens of the job description to put in the prompt.
     :return: File path to the generated PDF.
     """
-    # Get user details
+    prompt, key = document_key(user_data, job_data, doc_type, description_budget)
     name = user_data[1]
-    email = user_data[2]
-    phone = user_data[3]
-    github_linkedin = user_data[4]
-    projects = user_data[5]
-    classes = user_data[6]
-    other = user_data[7]
-
-    # Get job details
-    job_title = job_data.get("title", "[Insert Job Title]")
-    company_name = job_data.get("company", "[Insert Company Name]")
-    job_location = job_data.get("location", "[Insert Job Location]")
-    job_description = job_data.get("description", "[Insert Job Description]")
-
-    # AI prompt
-    if doc_type == "resume":
-        prompt = f"""
-        You are an expert resume writer. Create a professional resume in Markdown format for the following individual:
-
-        Name: {name}
-        Email: {email}
-        Phone: {phone}
-        GitHub/LinkedIn: {github_linkedin}
-
-        Applying for: {job_title} at {company_name}
-        Location: {job_location}
-
-        Job Description:
-        {job_description}
-
-        **Projects & Experience:**
-        {projects}
-
-        **Relevant Classes:**
-        {classes}
-
-        **Additional Information:**
-        {other}
-
-        Format the resume in a structured way.
-        """
-    elif doc_type == "cover_letter":
-        prompt = f"""
-        You are an expert cover letter writer. Create a professional cover letter in Markdown format for the following 
-        individual:
-
-        **{name}**
-        {email}
-        {phone}
-        {github_linkedin}
-
-        **{company_name}**
-        {job_title}
-        {job_location}
-
-        Dear Hiring Manager,
-
-        I am excited to apply for the {job_title} position at {company_name}.
-        With my background in {classes},I am eager to bring my expertise to your team.
-        My experience includes:
-
-        **Projects & Experience:**
-        {projects}
-
-        **Additional Information:**
-        {other}
-
-        I would love the opportunity to discuss how my skills can contribute to {company_name}.
-        Thank you for your time and consideration.
-
-        Best regards,  
-        **{name}**
-        """
-    else:
-        raise ValueError("Invalid document type. Use 'resume' or 'cover_letter'.")
 
-    # Generate AI response
-    response = chat_session.send_message(prompt)
-    markdown_content = response.text.strip()
+    # Define output PDF file path
+    pdf_filename = output_path or os.path.join("generated_pdfs", f"{name}_{doc_type}.pdf")
+    os.makedirs(os.path.dirname(pdf_filename) or ".", exist_ok=True)
 
-    # Convert markdown to HTML
-    # I used this method due to macOS issues for pdf conversions
-    html_content = markdown.markdown(markdown_content)
+    cached = None if regenerate else document_cache.get(key)
+    metrics.increment("document_cache_hits_total" if cached else "document_cache_misses_total")
+    if cached:
+        if on_chunk:
+            on_chunk(cached[0])
+        return _write_pdf(pdf_filename, lambda temp_path: shutil.copyfile(cached[1], temp_path))
 
-    # Define output PDF file path
-    output_dir = "generated_pdfs"
-    os.makedirs(output_dir, exist_ok=True)
-    pdf_filename = os.path.join(output_dir, f"{name}_{doc_type}.pdf")
+    # Generate AI response
+    if on_chunk:
+        markdown_content = stream_text(prompt, on_chunk).strip()
+    else:
+        markdown_content = generate_text(prompt).strip()
 
-    # Convert HTML to PDF using xhtml2pdf
-    with open(pdf_filename, 'wb') as pdf_file:
-        pisa.CreatePDF(html_content, dest=pdf_file)
+    def render(temp_path):
+        pdf_renderer.render(markdown_content, temp_path)
+        document_cache.put(key, markdown_content, temp_path)  # This generation's own PDF
 
-    return pdf_filename
+    return _write_pdf(pdf_filename, render)
 
 
 if __name__ == "__main__":
     create_database()  # Check the database exists
 
     # import JSON files
-    import_json_data("rapid_jobs2.json", "file1")
-    import_json_data("rapidResults.json", "file2")
-
-    print("Database update complete! No duplicate jobs inserted.")
+    for feed_file, feed_source in (("rapid_jobs2.json", "file1"), ("rapidResults.json", "file2")):
+        import_delta = incremental_import_json_data(feed_file, feed_source)
+        print(f"{feed_file}: {import_delta}")
+
+    print(f"Duplicate postings: {find_duplicates()}")
+    from job_ranking import update_index  # pylint: disable=wrong-import-position
+    print(f"Ranking index: {update_index()} jobs updated")
+    print("Database update complete! Only new and changed jobs were written.")
@@ -0,0 +1,250 @@
+"""
+metrics.py
+
+Timers, counters and histograms for the slow paths: feed imports, single
+job inserts, insert batches, model requests, markdown conversion and PDF
+rendering. Recording is off by default and costs one flag check per call
+while off. enable() and disable() switch it at runtime, and setting
+JOB_METRICS to a file path records a whole run and writes the metrics there
+when the process exits. write_metrics saves a JSON snapshot, or the
+Prometheus text format for a .prom file. capture() runs cProfile and
+tracemalloc around a single import or generation run.
+
+Each process keeps its own metrics, so PDFs rendered by ProcessPoolRenderer
+workers and feeds parsed by ingest workers only show up in the parent as
+their callers' time.
+
+Run with: JOB_METRICS=metrics.prom python main.py
+          python cli.py --metrics metrics.json --profile import_run import feed.json
+"""
+
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the histogram buckets, like Prometheus' le labels
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOP_FUNCTIONS = 40  # Functions listed in a capture's report
+TOP_ALLOCATIONS = 25  # Source lines listed in a capture's memory report
+
+
+class Histogram:
+    """Count, sum, minimum, maximum and bucket counts of observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        """Records one value."""
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def cumulative(self):
+        """(le label, values <= le) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip((*map(str, self.buckets), "+Inf"), self.bucket_counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def to_dict(self):
+        """The histogram as JSON-ready values."""
+        return {
+            "count": self.count, "sum": round(self.sum, 6), "min": self.min, "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class Metrics:
+    """Named counters and histograms. Nothing is recorded until enabled is set."""
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()  # Batch generation records from several threads
+
+    def increment(self, name, amount=1):
+        """Adds amount to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """Records a value, usually seconds, in a histogram."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Counters and histograms as a JSON-ready dictionary."""
+        with self._lock:
+            return {
+                "time": time.time(),
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {name: histogram.to_dict()
+                               for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def prometheus_text(self):
+        """Counters and histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {name} counter", f"{name} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                lines += [f'{name}_bucket{{le="{bound}"}} {count}'
+                          for bound, count in histogram.cumulative()]
+                lines += [f"{name}_sum {histogram.sum}", f"{name}_count {histogram.count}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Metrics()
+
+
+def enable():
+    """Starts recording."""
+    registry.enabled = True
+
+
+def disable():
+    """Stops recording. What was recorded is kept until reset."""
+    registry.enabled = False
+
+
+def increment(name, amount=1):
+    """Adds amount to a counter of the shared registry."""
+    registry.increment(name, amount)
+
+
+def observe(name, value):
+    """Records a value in a histogram of the shared registry."""
+    registry.observe(name, value)
+
+
+class Timer:
+    """Context manager recording the seconds its block takes in a histogram."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if registry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            registry.observe(self.name, time.perf_counter() - self.start)
+
+
+def timer(name):
+    """Times a with block into the histogram called name."""
+    return Timer(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function into the histogram called name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                registry.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def write_metrics(path):
+    """
+    Writes the shared registry to path, in the Prometheus text format for a
+    .prom file and as JSON otherwise. The file is replaced in one step, so a
+    scraper never reads half of it.
+    """
+    if path.endswith(".prom"):
+        text = registry.prometheus_text()
+    else:
+        text = json.dumps(registry.snapshot(), indent=2)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+    return path
+
+
+@contextlib.contextmanager
+def capture(prefix, memory=True):
+    """
+    Profiles the with block with cProfile and, if memory is set, tracemalloc.
+    Writes the raw profile to {prefix}.prof, for pstats or snakeviz, and a
+    report of the slowest functions, peak memory and the lines that allocated
+    the most to {prefix}.txt. Meant for one import or generation run, since
+    tracemalloc slows everything down several times.
+    """
+    import cProfile  # pylint: disable=import-outside-toplevel
+    import pstats  # pylint: disable=import-outside-toplevel
+    import tracemalloc  # pylint: disable=import-outside-toplevel
+
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}.txt", "w", encoding="utf-8") as report:
+            stats = pstats.Stats(profiler, stream=report)
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            if memory:
+                _, peak = tracemalloc.get_traced_memory()
+                allocations = tracemalloc.take_snapshot().compare_to(before, "lineno")
+                report.write(f"Peak traced memory: {peak / 1e6:.1f} MB\n\n")
+                report.writelines(f"{line}\n" for line in allocations[:TOP_ALLOCATIONS])
+            if started_tracing:
+                tracemalloc.stop()
+
+
+if os.environ.get("JOB_METRICS") and multiprocessing.parent_process() is None:
+    enable()
+    atexit.register(write_metrics, os.environ["JOB_METRICS"])
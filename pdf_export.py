@@ -0,0 +1,265 @@
+"""
+pdf_export.py
+
+Bulk export of generated resumes and cover letters. Every document is
+written to generated_pdfs/{profile}/{job id}/{doc type}-{hash}.pdf, where the
+hash is of the PDF itself, so documents for different jobs and every
+regenerated version get their own file and nothing is overwritten. The
+document_manifest table maps each document version (the prompt's cache key,
+see main.document_key) to its file, so asking for a document that was
+exported before is answered from disk without the model or a render.
+Documents are generated on a thread pool, and a batch can be packaged into a
+zip that is written as the documents finish.
+
+Run with: python pdf_export.py job_001 job_002 --profile "Joey P" --zip shortlist.zip
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from batch_generate import DOC_TYPES
+from db_connection import get_connection
+from json_database import DB_NAME, get_job_for_generation, load_user_profile
+from main import (
+    PdfRenderer, ProcessPoolRenderer, document_key, generate_resume_and_cover_letter,
+    set_pdf_renderer
+)
+
+EXPORT_DIR = "generated_pdfs"
+DEFAULT_WORKERS = 4  # Documents generated at once
+HASH_CHUNK_SIZE = 1 << 16
+
+
+def create_manifest_table(db_name=DB_NAME):
+    """Creates the table mapping document versions to their exported files."""
+    conn = get_connection(db_name)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS document_manifest (
+            version TEXT PRIMARY KEY,
+            profile_name TEXT,
+            job_id TEXT,
+            doc_type TEXT,
+            pdf_path TEXT,
+            sha256 TEXT,
+            bytes INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_manifest_document
+            ON document_manifest (profile_name, job_id, doc_type);
+        """
+    )
+
+
+def safe_name(text):
+    """A path component for any profile name or job ID."""
+    return re.sub(r"[^\w.-]+", "_", str(text)).strip(".") or "_"
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as pdf_file:
+        while chunk := pdf_file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_entry(version, db_name=DB_NAME):
+    """The manifest row of a document version as a dictionary, or None if its file is gone."""
+    columns = ("version", "profile_name", "job_id", "doc_type", "pdf_path", "sha256", "bytes",
+               "created_at")
+    row = get_connection(db_name).execute(
+        f"SELECT {', '.join(columns)} FROM document_manifest WHERE version = ?", (version,)
+    ).fetchone()
+    if row is None or not os.path.exists(row[4]):
+        return None
+    return dict(zip(columns, row))
+
+
+def export_document(user_data, job_data, doc_type, export_dir=EXPORT_DIR, regenerate=False):
+    """
+    Generates one document into its content-addressed path. It is rendered
+    to a temporary name first and renamed after its hash, so readers never
+    see a partial file and two versions never share a name.
+    :return: (PDF path, SHA-256, bytes)
+    """
+    directory = os.path.join(export_dir, safe_name(user_data[1]), safe_name(job_data["id"]))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(".pdf.tmp", f".{doc_type}-", directory)
+    os.close(fd)
+    try:
+        generate_resume_and_cover_letter(user_data, job_data, doc_type, regenerate,
+                                         output_path=temp_path)
+        digest = file_digest(temp_path)
+        pdf_path = os.path.join(directory, f"{doc_type}-{digest[:16]}.pdf")
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, pdf_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return pdf_path, digest, size
+
+
+class ZipPackage:
+    """
+    Zip file that documents are added to as they finish. PDFs are already
+    compressed, so entries are stored as they are and copied in chunks. The
+    zip is written under a temporary name and only appears once closed.
+    """
+
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self.temp_path = f"{zip_path}.tmp"
+        os.makedirs(os.path.dirname(zip_path) or ".", exist_ok=True)
+        self.archive = zipfile.ZipFile(self.temp_path, "w", zipfile.ZIP_STORED)  # pylint: disable=consider-using-with
+        self.names = {}  # Name in the zip -> PDF added under it
+
+    def add(self, pdf_path, profile_name, job_id, doc_type):
+        """
+        Adds one document as {profile}/{job id}/{doc type}.pdf. When a different
+        document already has that name, as when two job IDs only differ in
+        characters a path can't hold, the PDF's content-addressed file name is
+        used instead.
+        :return: The document's name in the zip.
+        """
+        name = f"{safe_name(profile_name)}/{safe_name(job_id)}/{doc_type}.pdf"
+        if self.names.get(name, pdf_path) != pdf_path:
+            name = f"{os.path.dirname(name)}/{os.path.basename(pdf_path)}"
+        if name not in self.names:
+            self.names[name] = pdf_path
+            self.archive.write(pdf_path, name)
+        return name
+
+    def close(self, manifest):
+        """Adds the batch's manifest.json and moves the zip into place."""
+        self.archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        self.archive.close()
+        os.replace(self.temp_path, self.zip_path)
+
+    def discard(self):
+        """Closes and deletes an unfinished zip."""
+        self.archive.close()
+        os.remove(self.temp_path)
+
+
+def _record(conn, result, digest, size):
+    """Adds an exported document to the manifest, replacing an older file of the same version."""
+    conn.execute(
+        "INSERT OR REPLACE INTO document_manifest (version, profile_name, job_id, doc_type, "
+        "pdf_path, sha256, bytes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (result["version"], result["profile"], result["job_id"], result["doc_type"],
+         result["pdf_path"], digest, size),
+    )
+    conn.commit()
+
+
+def export_documents(profile_names, job_ids, doc_types=DOC_TYPES, db_name=DB_NAME,  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+                     zip_path=None, workers=DEFAULT_WORKERS, regenerate=False,
+                     export_dir=EXPORT_DIR, on_result=None):
+    """
+    Exports every profile/job/document combination. Versions already in the
+    manifest are served from disk, the rest are generated workers at a time.
+    :param zip_path: Also package the documents into this zip file.
+    :param regenerate: Ask the model again even for exported versions.
+    :param on_result: Called with each result dictionary as it is ready.
+    :return: Result dictionaries with profile, job_id, doc_type, pdf_path, version,
+             served ("manifest" or "generated"), seconds and error, plus zip_name
+             for documents packaged into the zip.
+    """
+    create_manifest_table(db_name)
+    conn = get_connection(db_name)
+    job_ids = list(dict.fromkeys(job_ids))
+    profiles = {name: load_user_profile(name, db_name) for name in profile_names}
+    jobs = {job_id: get_job_for_generation(job_id, db_name) for job_id in job_ids}
+    results = []
+    package = ZipPackage(zip_path) if zip_path else None
+
+    def finish(result):
+        if result["error"] is None and package:
+            result["zip_name"] = package.add(result["pdf_path"], result["profile"],
+                                             result["job_id"], result["doc_type"])
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    def generate(result, user_data, job_data):
+        start = time.perf_counter()
+        digest = size = None
+        try:
+            result["pdf_path"], digest, size = export_document(
+                user_data, job_data, result["doc_type"], export_dir, regenerate)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["seconds"] = round(time.perf_counter() - start, 4)
+        return result, digest, size
+
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            futures = []
+            for profile_name, job_id, doc_type in itertools.product(profile_names, job_ids,
+                                                                    doc_types):
+                result = {"profile": profile_name, "job_id": job_id, "doc_type": doc_type,
+                          "pdf_path": None, "version": None, "served": None, "seconds": 0.0,
+                          "error": None}
+                user_data, job_data = profiles[profile_name], jobs[job_id]
+                if user_data is None or job_data is None:
+                    result["error"] = f"Unknown {'profile' if user_data is None else 'job'}"
+                    finish(result)
+                    continue
+                result["version"] = document_key(user_data, job_data, doc_type)[1]
+                entry = None if regenerate else manifest_entry(result["version"], db_name)
+                if entry:
+                    result["pdf_path"], result["served"] = entry["pdf_path"], "manifest"
+                    finish(result)
+                else:
+                    result["served"] = "generated"
+                    futures.append(pool.submit(generate, result, user_data, job_data))
+
+            for future in as_completed(futures):
+                result, digest, size = future.result()
+                if result["error"] is None:
+                    # Only this thread writes, so the workers never wait on each other
+                    _record(conn, result, digest, size)
+                finish(result)
+    except BaseException:
+        if package:
+            package.discard()
+        raise
+    if package:
+        package.close(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export documents for many jobs at once.")
+    parser.add_argument("job_ids", nargs="+", help="IDs of the jobs to export documents for")
+    parser.add_argument("--profile", action="append", required=True,
+                        help="profile name, can be repeated")
+    parser.add_argument("--zip", help="also package the documents into this zip file")
+    parser.add_argument("--doc-type", action="append", choices=DOC_TYPES,
+                        help="document type, both by default")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--render-processes", type=int, default=0,
+                        help="render PDFs in this many worker processes")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="generate new versions even of exported documents")
+    args = parser.parse_args()
+
+    if args.render_processes:
+        set_pdf_renderer(ProcessPoolRenderer(args.render_processes))
+    try:
+        export_documents(args.profile, args.job_ids, tuple(args.doc_type or DOC_TYPES), args.db,
+                         args.zip, args.workers, args.regenerate,
+                         on_result=lambda result: print(json.dumps(result)))
+    finally:
+        set_pdf_renderer(PdfRenderer()).close()
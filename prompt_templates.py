@@ -0,0 +1,114 @@
+"""
+prompt_templates.py
+
+Prompt templates for the documents Gemini writes. Templates are text files
+in the prompts/ directory with {placeholder} fields. Each one is read and
+checked once, the first time it's used, then rendered from a user profile
+tuple and a job dictionary. Job descriptions longer than a token budget are
+cut down before they go into a prompt, since some feed descriptions are
+thousands of tokens long.
+
+Run with: python prompt_templates.py
+"""
+
+import functools
+import hashlib
+import os
+import string
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+DOCUMENT_TYPES = ("resume", "cover_letter")
+CHARS_PER_TOKEN = 4  # Rough average for English text with Gemini's tokenizer
+DESCRIPTION_TOKEN_BUDGET = 1500
+
+# Placeholders filled from the user_profiles row, in column order after the ID
+PROFILE_FIELDS = ("name", "email", "phone", "github_linkedin", "projects", "classes", "other")
+# Placeholders filled from the job dictionary: {placeholder: (job key, default)}
+JOB_FIELDS = {
+    "job_title": ("title", "[Insert Job Title]"),
+    "company_name": ("company", "[Insert Company Name]"),
+    "job_location": ("location", "[Insert Job Location]"),
+    "job_description": ("description", "[Insert Job Description]"),
+}
+TEMPLATE_FIELDS = frozenset(PROFILE_FIELDS) | frozenset(JOB_FIELDS) | {"job_desc", "personal_desc"}
+
+
+class PromptTemplate:  # pylint: disable=too-few-public-methods
+    """A prompt template whose placeholders have been checked against TEMPLATE_FIELDS."""
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self.placeholders = self._parse()
+
+    def _parse(self):
+        """Returns the template's placeholders, raising ValueError for ones we can't fill."""
+        placeholders = set()
+        for _, field, format_spec, conversion in string.Formatter().parse(self.text):
+            if field is None:
+                continue
+            if field not in TEMPLATE_FIELDS or format_spec or conversion:
+                raise ValueError(f"Unknown placeholder {{{field}}} in prompt template {self.name}")
+            placeholders.add(field)
+        return frozenset(placeholders)
+
+    def render(self, fields):
+        """Fills in the placeholders from the fields dictionary."""
+        return self.text.format_map(fields)
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(name, prompt_dir=PROMPT_DIR):
+    """Loads and checks prompts/{name}.txt the first time it's asked for."""
+    with open(os.path.join(prompt_dir, f"{name}.txt"), "r", encoding="utf-8") as f:
+        return PromptTemplate(name, f.read())
+
+
+def estimate_tokens(text):
+    """Estimates how many tokens the model will count in text."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, budget):
+    """Shortens text to about budget tokens, ending on a sentence or word boundary."""
+    if estimate_tokens(text) <= budget:
+        return text
+    cut = text[:budget * CHARS_PER_TOKEN]
+    end = max(cut.rfind(". "), cut.rfind("\n"))
+    if end < len(cut) // 2:  # No sentence break near the end, settle for a word
+        end = cut.rfind(" ")
+    return cut[:end + 1].rstrip() + " [...]"
+
+
+def document_fields(user_data, job_data, description_budget=DESCRIPTION_TOKEN_BUDGET):
+    """Builds the placeholder values for a resume or cover letter prompt."""
+    fields = dict(zip(PROFILE_FIELDS, user_data[1:]))
+    for field, (key, default) in JOB_FIELDS.items():
+        fields[field] = job_data.get(key, default)
+    fields["job_description"] = truncate_to_tokens(str(fields["job_description"]),
+                                                   description_budget)
+    return fields
+
+
+def render_prompt(doc_type, user_data, job_data, description_budget=DESCRIPTION_TOKEN_BUDGET):
+    """
+    Renders the prompt for one document.
+    :param doc_type: "resume" or "cover_letter".
+    :param user_data: Row from the user_profiles table.
+    :param job_data: Dictionary containing job details.
+    :param description_budget: Most tokens of the job description to include.
+    :return: The prompt text.
+    """
+    if doc_type not in DOCUMENT_TYPES:
+        raise ValueError("Invalid document type. Use 'resume' or 'cover_letter'.")
+    return get_template(doc_type).render(document_fields(user_data, job_data,
+                                                         description_budget))
+
+
+if __name__ == "__main__":
+    for template_name in (*DOCUMENT_TYPES, "create_resume"):
+        template = get_template(template_name)
+        print(f"{template.name:14} version {template.version}  "
+              f"{estimate_tokens(template.text):4} tokens before filling in  "
+              f"placeholders: {', '.join(sorted(template.placeholders))}")
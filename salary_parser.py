@@ -0,0 +1,185 @@
+"""
+salary_parser.py
+
+Turns the pay information of both feed formats into numbers that can be
+compared. rapid_jobs2-format jobs only have a salaryRange string such as
+"120K–130K a year" or "45–50 an hour", and the other feed has min_amount,
+max_amount, currency and interval fields. Both are annualized, so an hourly
+job and a salaried one can be filtered with the same range query on the
+indexed salary_min and salary_max columns.
+
+Run with: python salary_parser.py "45–50 an hour"
+"""
+
+import argparse
+import functools
+import re
+
+HOURS_PER_YEAR = 2080  # 40 hours a week, 52 weeks
+PERIODS = {"hour": HOURS_PER_YEAR, "day": 260, "week": 52, "month": 12, "year": 1}
+PERIOD_WORDS = {
+    "hour": "hour", "hr": "hour", "hourly": "hour",
+    "day": "day", "daily": "day",
+    "week": "week", "wk": "week", "weekly": "week",
+    "month": "month", "mo": "month", "monthly": "month",
+    "year": "year", "yr": "year", "yearly": "year", "annum": "year", "annual": "year",
+    "annually": "year",
+    # rapid_jobs2 also has German, French and Italian listings
+    "stunde": "hour", "heure": "hour", "ora": "hour",
+    "tag": "day", "jour": "day", "giorno": "day",
+    "woche": "week", "semaine": "week", "settimana": "week",
+    "monat": "month", "mois": "month", "mese": "month",
+    "jahr": "year", "an": "year", "anno": "year",
+}
+CURRENCY_SYMBOLS = {
+    "$": "USD", "US$": "USD", "$US": "USD", "C$": "CAD", "CA$": "CAD", "A$": "AUD", "€": "EUR",
+    "£": "GBP", "¥": "JPY", "₹": "INR",
+}
+CURRENCY_CODES = ("USD", "CAD", "AUD", "NZD", "EUR", "GBP", "CHF", "JPY", "INR", "SGD", "MXN")
+# rapid_jobs2 drops the currency symbol from salaryRange; its listings are from US job boards
+DEFAULT_CURRENCY = "USD"
+SUFFIXES = {"k": 1e3, "m": 1e6}
+SALARY_CACHE_SIZE = 4096  # Distinct salary strings remembered by cached_salary_range
+
+_CURRENCY = "|".join(re.escape(currency) for currency in sorted(
+    (*CURRENCY_SYMBOLS, *CURRENCY_CODES), key=len, reverse=True))
+_PERIOD_WORD = "|".join(sorted(PERIOD_WORDS, key=len, reverse=True))
+# Digits are taken whole, with "," "’" or a (narrow) no-break space between thousands and
+# at most two decimals, so "120.000" or "1.2L" never match as part of a shorter number
+_NUMBER = (r"(?<![\d.,’])(?<!\d[\u202f\xa0])(?>\d{1,3}(?:[,’\u202f\xa0]\d{3})+|\d+)"
+           r"(?:\.\d{1,2})?(?!\.?\d|[,’\u202f\xa0]\d)")
+# An amount may run straight into a period ("50hr") but not into any other word or unit
+_AMOUNT = re.compile(rf"(?P<currency>{_CURRENCY})?\s*(?P<number>{_NUMBER})"
+                     rf"(?:\s*(?P<suffix>[kKmM])(?![^\W\d_]))?"
+                     rf"(?!(?!(?i:{_PERIOD_WORD})\b)[^\W\d_])")
+_PERIOD = re.compile(rf"(?:\b(?:an?|per)\s+|/\s*|\b|(?<=\d))({_PERIOD_WORD})\b",
+                     re.IGNORECASE)
+# A whole salary string: an amount or a range, then an optional period such as "a year"
+_SALARY_AMOUNT = rf"(?:{_CURRENCY})?\s*{_NUMBER}(?:\s*[kKmM])?(?:\s*(?:{_CURRENCY}))?"
+_SALARY = re.compile(rf"\s*{_SALARY_AMOUNT}(?:\s*(?:[-–—]|to|bis|à)\s*{_SALARY_AMOUNT})?"
+                     rf"\s*(?:(?:(?:an?|per|pro|par)\s+|/\s*|all')?(?:{_PERIOD_WORD})\b)?[\s.]*",
+                     re.IGNORECASE)
+_CODE = re.compile(rf"\b({'|'.join(CURRENCY_CODES)})\b")
+
+EMPTY_SALARY = {"salary_min": None, "salary_max": None, "salary_currency": None,
+                "salary_period": None}
+
+
+def parse_amount(text):
+    """Reads one amount such as "88.2K", "$97,750" or "50", or None if there isn't one."""
+    match = _AMOUNT.search(str(text or ""))
+    if match is None:
+        return None
+    return _number(match)
+
+
+def _number(match):
+    """Value of an _AMOUNT match with its K or M suffix applied."""
+    value = float(re.sub(r"[,’\u202f\xa0]", "", match.group("number")))
+    return value * SUFFIXES.get((match.group("suffix") or "").lower(), 1)
+
+
+def annualize(amount, period):
+    """Amount paid per period, as a yearly figure."""
+    if amount is None:
+        return None
+    return round(amount * PERIODS[period], 2)
+
+
+def parse_salary_range(text, default_currency=None):
+    """
+    Parses a salary string such as "120K–130K a year" or "$45-50/hr".
+    Amounts without a period are taken as yearly, and so is a bare number.
+    In any other text, such as "2 years experience, $70K", only amounts with
+    a currency or a K/M suffix count.
+    :return: Dictionary with annualized salary_min and salary_max, salary_currency
+             and the original salary_period, or None if text holds no amount.
+    """
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        text = str(text)
+    if not isinstance(text, str):  # None, or a list or object a feed put here
+        return None
+    matches = list(_AMOUNT.finditer(text))
+    if not _SALARY.fullmatch(text):
+        matches = [match for match in matches if match.group("currency") or match.group("suffix")]
+    matches = matches[:2]
+    if not matches:
+        return None
+    low = high = _number(matches[0])
+    if len(matches) > 1:
+        high = _number(matches[1])
+        # "120–130K" writes the suffix once, for both ends of the range
+        if matches[1].group("suffix") and not matches[0].group("suffix") and low < 1000 <= high:
+            low *= SUFFIXES[matches[1].group("suffix").lower()]
+    period_match = _PERIOD.search(text)
+    period = PERIOD_WORDS[period_match.group(1).lower()] if period_match else "year"
+    currency = next((match.group("currency") for match in matches if match.group("currency")),
+                    None)
+    if currency is None:
+        code = _CODE.search(text)
+        currency = code.group(1) if code else default_currency
+    return {
+        "salary_min": annualize(min(low, high), period),
+        "salary_max": annualize(max(low, high), period),
+        "salary_currency": CURRENCY_SYMBOLS.get(currency, currency),
+        "salary_period": period,
+    }
+
+
+@functools.lru_cache(maxsize=SALARY_CACHE_SIZE)
+def cached_salary_range(text, default_currency=None):
+    """
+    parse_salary_range for the salary strings a feed repeats on many jobs, with
+    EMPTY_SALARY when there's no amount. The dictionaries are shared between
+    calls, so they must not be changed.
+    """
+    return parse_salary_range(text, default_currency) or EMPTY_SALARY
+
+
+def to_number(value):
+    """A feed amount as a float, or None when it's missing or not a number."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def salary_from_amounts(low, high, interval, currency):
+    """Annualized salary fields from numeric amounts, at least one of them not None."""
+    period = PERIOD_WORDS.get(str(interval or "year").lower(), "year")
+    return {
+        "salary_min": annualize(low if low is not None else high, period),
+        "salary_max": annualize(high if high is not None else low, period),
+        "salary_currency": currency or None,
+        "salary_period": period,
+    }
+
+
+def salary_fields(job):
+    """
+    Annualized salary fields of a raw job in either feed format.
+    :return: Dictionary with the keys of EMPTY_SALARY.
+    """
+    low, high = to_number(job.get("min_amount")), to_number(job.get("max_amount"))
+    if low is not None or high is not None:
+        return salary_from_amounts(low, high, job.get("interval"), job.get("currency"))
+    return parse_salary_range(job.get("salaryRange"), DEFAULT_CURRENCY) or dict(EMPTY_SALARY)
+
+
+def format_salary(salary_min, salary_max, currency=None):
+    """Readable yearly pay range, such as "93,600–104,000 USD a year"."""
+    if salary_min is None and salary_max is None:
+        return "Not listed"
+    low, high = (salary_min or salary_max), (salary_max or salary_min)
+    amount = f"{low:,.0f}" if low == high else f"{low:,.0f}–{high:,.0f}"
+    return " ".join(filter(None, (amount, currency, "a year")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse salary strings.")
+    parser.add_argument("text", nargs="+", help="salary string, e.g. \"120K–130K a year\"")
+    args = parser.parse_args()
+    for salary_text in args.text:
+        print(f"{salary_text!r}: {parse_salary_range(salary_text, DEFAULT_CURRENCY)}")
@@ -1,97 +1,210 @@
 """User Interface file for displaying job listings and storing user profiles."""
 # pylint: disable=no-member
 
-import sqlite3
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
 import PySimpleGUI as sg
-from json_database import create_user_profiles_table
-from main import generate_resume_and_cover_letter
+from json_database import (
+    PAGE_SIZE, create_database, get_job_for_generation, get_job_info, get_jobs_page,
+    get_user_profiles, load_user_profile, save_user_profile
+)
+from job_search import search_jobs
+from main import generate_resume_and_cover_letter, job_output_path
+from salary_parser import format_salary, parse_amount
 
 DB_NAME = "jobs.db"
-
-
-def get_jobs():
-    """gets job listings from the database."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, title, company, location FROM jobs")
-    jobs = cursor.fetchall()
-    conn.close()
-    return jobs
-
-
-def get_job_info(job_id):
-    """gets job details from the database for a job ID."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
-    job = cursor.fetchone()
-    conn.close()
-    return job
+GENERATION_WORKERS = 2
+GENERATION_DONE = "-GENERATION_DONE-"
+GENERATION_PREVIEW = "-GENERATION_PREVIEW-"
+# user_profiles column -> GUI input key
+PROFILE_INPUTS = {"name": "-NAME-", "email": "-EMAIL-", "phone": "-PHONE-",
+                  "github_linkedin": "-GITHUB-", "projects": "-PROJECTS-", "classes": "-CLASSES-",
+                  "other": "-OTHER-"}
+
+
+class JobPager:  # pylint: disable=too-many-instance-attributes
+    """Tracks which page of jobs, or of search results, the job table is showing."""
+
+    def __init__(self, page_size=PAGE_SIZE, db_name=DB_NAME):
+        self.page_size = page_size
+        self.db_name = db_name
+        self.query = ""
+        self.filters = {}
+        self.profile = None  # user_profiles row the jobs are ranked for
+        self.page = 1
+        self.page_starts = [None]  # Key to seek after for each browsed page
+        self.rows = []  # (id, title, company, location) for the rows on screen
+        self.has_next = False
+
+    def load(self):
+        """Fetches the current page and returns its rows."""
+        if self.profile:
+            # NumPy and SciPy are only loaded once jobs are first ranked
+            from job_ranking import rank_jobs  # pylint: disable=import-outside-toplevel
+            end = self.page * self.page_size
+            ranked = rank_jobs(self.profile, end + 1, self.db_name)
+            self.rows = [(job["id"], job["title"], job["company"], job["location"])
+                         for job in ranked[end - self.page_size:end]]
+            self.has_next = len(ranked) > end
+        elif self.query or self.filters:
+            result = search_jobs(self.query, self.filters, self.page, self.page_size,
+                                 self.db_name)
+            self.rows = [(job["id"], job["title"], job["company"], job["location"])
+                         for job in result["jobs"]]
+            self.has_next = self.page < result["pages"]
+        else:
+            # One extra row tells us whether there is a next page without counting the table
+            rows = get_jobs_page(self.page_starts[self.page - 1], self.page_size + 1,
+                                 self.db_name)
+            self.has_next = len(rows) > self.page_size
+            self.rows = rows[:self.page_size]
+            if self.has_next and len(self.page_starts) == self.page:
+                self.page_starts.append(self.rows[-1][0])
+        return self.rows
+
+    def search(self, query, filters=None):
+        """
+        Starts over at the first page of a search, or of all jobs for empty text.
+        :param filters: Optional search filters, such as {"min_salary": 90000}.
+        """
+        self.query = query.strip()
+        self.filters = {name: value for name, value in (filters or {}).items()
+                        if value is not None}
+        self.profile = None
+        self.page = 1
+        self.page_starts = [None]
+        return self.load()
+
+    def rank(self, profile):
+        """Starts over at the first page of all jobs, best matches for profile first."""
+        self.query, self.filters, self.profile = "", {}, profile
+        self.page = 1
+        return self.load()
+
+    def next_page(self):
+        """Moves forward one page if there is one."""
+        if self.has_next:
+            self.page += 1
+        return self.load()
+
+    def previous_page(self):
+        """Moves back one page if there is one."""
+        self.page = max(1, self.page - 1)
+        return self.load()
+
+    def job_id(self, row_index):
+        """Maps a selected table row to its job ID."""
+        return self.rows[row_index][0]
+
+    def table_values(self):
+        """Rows formatted for the job table."""
+        return [[job[1], job[2], job[3]] for job in self.rows]
+
+
+class GenerationQueue:
+    """
+    Runs document generation on worker threads so the window stays responsive.
+    Each finished, failed or cancelled document is reported by calling
+    post_event(GENERATION_DONE, ticket); the GUI passes window.write_event_value.
+    While a document streams in, post_event(GENERATION_PREVIEW, (ticket, markdown))
+    delivers the markdown received so far.
+    """
+
+    def __init__(self, post_event, workers=GENERATION_WORKERS, generate=None):
+        self.post_event = post_event
+        self.generate = generate or generate_resume_and_cover_letter
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="generate")
+        self.tasks = {}  # ticket -> (future, description)
+        self.cancelled = set()
+        self._tickets = itertools.count(1)
+
+    def submit(self, description, *args, **kwargs):
+        """Queues one document and returns its ticket."""
+        ticket = next(self._tickets)
+
+        def on_chunk(markdown_so_far):
+            if ticket not in self.cancelled:
+                self.post_event(GENERATION_PREVIEW, (ticket, markdown_so_far))
+
+        future = self.executor.submit(self.generate, *args, on_chunk=on_chunk, **kwargs)
+        self.tasks[ticket] = (future, description)
+        future.add_done_callback(lambda _: self.post_event(GENERATION_DONE, ticket))
+        return ticket
+
+    def collect(self, ticket):
+        """
+        Takes a finished document off the queue. Call from the event loop.
+        :return: (description, pdf_path, error); pdf_path and error are both None when cancelled.
+        """
+        future, description = self.tasks.pop(ticket)
+        cancelled = ticket in self.cancelled or future.cancelled()
+        self.cancelled.discard(ticket)
+        if cancelled:
+            return description, None, None
+        error = future.exception()
+        return description, None if error else future.result(), error
+
+    def cancel_all(self):
+        """Drops queued documents. Ones already running finish but their results are ignored."""
+        for ticket, (future, _) in list(self.tasks.items()):
+            if not future.cancel():
+                self.cancelled.add(ticket)
+
+    @property
+    def running(self):
+        """Number of documents being generated right now."""
+        return sum(future.running() for future, _ in self.tasks.values())
+
+    def status(self):
+        """Short progress text for the window."""
+        if not self.tasks:
+            return "Idle"
+        waiting = len(self.tasks) - self.running - len(self.cancelled)
+        return f"Generating {self.running}, {max(waiting, 0)} queued"
+
+    def shutdown(self):
+        """Cancels queued documents and stops the workers without waiting for running ones."""
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
 
 def save_user(values):
     """Saves or updates the user's profile info in jobs.db."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    # Ensure the user_profiles table exists
-    create_user_profiles_table()
-
-    cursor.execute('''
-        INSERT OR REPLACE INTO user_profiles (name, email, phone, github_linkedin, projects, classes, other)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        values.get("-NAME-", ""), values.get("-EMAIL-", ""), values.get("-PHONE-", ""),
-        values.get("-GITHUB-", ""), values.get("-PROJECTS-", ""), values.get("-CLASSES-", ""),
-        values.get("-OTHER-", "")
-    ))
-
-    conn.commit()
-    conn.close()
+    save_user_profile({column: values.get(key, "") for column, key in PROFILE_INPUTS.items()},
+                      DB_NAME)
 
     if __name__ == "__main__":  # Only show the popup when running GUI
         sg.popup("User profile saved.", title="Success")
 
 
-def get_user_profiles():
-    """gets the list of saved user profiles from jobs.db."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM user_profiles")
-    profiles = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return profiles
-
-
-def load_user_profile(selected_name):
-    """gets a user's saved profile info when a profile is chosen."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user_profiles WHERE name=?", (selected_name,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-
-# Convert job data for displaying in the GUI
 job_headers = ["Title", "Company", "Location"]
-job_data = get_jobs()
-formatted_job_data = [[job[1], job[2], job[3]] for job in job_data]
 
 # GUI theme
 sg.theme("DarkBlue")
 
 
-# pylint: disable=too-many-locals
+# pylint: disable=too-many-locals,too-many-branches,too-many-statements
 
 def open_gui():
     """opens PySimpleGUI to display job listings and user profiles."""
+    create_database(DB_NAME)  # Make sure the search index exists
+    pager = JobPager()
+    pager.load()
 
     # Left side - Job List (Table with horizontal scrolling)
     job_list_column = [
         [sg.Text("Job Listings", font=("Helvetica", 14, "bold"))],
+        [sg.Input(size=(40, 1), key="-SEARCH-"),
+         sg.Button("Search", key="-SEARCH_BUTTON-", bind_return_key=True)],
+        [sg.Text("Min yearly pay:"),
+         sg.Input(size=(10, 1), key="-MIN_SALARY-", tooltip="For example 90K"),
+         sg.Text("Max:"),
+         sg.Input(size=(10, 1), key="-MAX_SALARY-", tooltip="For example 150K"),
+         sg.Button("Best Matches", key="-RANK_JOBS-",
+                   tooltip="Sort jobs by how well they match the selected profile")],
         [sg.Table(
-            values=formatted_job_data,
+            values=pager.table_values(),
             headings=job_headers,
             auto_size_columns=False,
             col_widths=[30, 20, 20],
@@ -102,13 +215,17 @@ def open_gui():
             expand_x=True,
             expand_y=True,
             vertical_scroll_only=False  # Enables horizontal scrolling
-        )]
+        )],
+        [sg.Button("< Prev", key="-PREV_PAGE-"), sg.Text("Page 1", key="-PAGE-", size=(10, 1)),
+         sg.Button("Next >", key="-NEXT_PAGE-")]
     ]
 
     # Right side - Job Details (Displays job info)
     job_details_column = [
         [sg.Text("Job Details", font=("Helvetica", 14, "bold"))],
-        [sg.Multiline("", size=(70, 12), key="-JOB_DETAILS-", disabled=True)]
+        [sg.Multiline("", size=(70, 12), key="-JOB_DETAILS-", disabled=True)],
+        [sg.Text("Document Preview", font=("Helvetica", 14, "bold"))],
+        [sg.Multiline("", size=(70, 8), key="-PREVIEW-", disabled=True, autoscroll=True)]
     ]
 
     # User Information Entry
@@ -127,7 +244,11 @@ def open_gui():
         [sg.Button("Save User Info", size=(15, 1)),
          sg.Button("Generate Resume", key="-GENERATE_RESUME-", size=(20, 1)),
          sg.Button("Generate Cover Letter", key="-GENERATE_COVER_LETTER-", size=(20, 1)),
-         sg.Button("Exit", size=(10, 1))]
+         sg.Checkbox("Regenerate", key="-REGENERATE-", tooltip="Skip previously generated copies"),
+         sg.Button("Exit", size=(10, 1))],
+        [sg.Text("Idle", key="-GENERATION_STATUS-", size=(30, 1)),
+         sg.ProgressBar(10, orientation="h", size=(20, 15), key="-GENERATION_PROGRESS-"),
+         sg.Button("Cancel Generation", key="-CANCEL_GENERATION-")]
     ]
 
     # Full Layout
@@ -139,14 +260,22 @@ def open_gui():
 
     # Create the Window
     window = sg.Window("Job Listings & User Info", layout, resizable=True)
+    generation = GenerationQueue(window.write_event_value)
+    spinner = itertools.cycle(range(11))
 
     # Event Loop
     while True:
-        event, values = window.read()
+        # Wake up regularly while documents are generating to animate the progress bar
+        event, values = window.read(timeout=200 if generation.tasks else None)
 
         if event in {sg.WINDOW_CLOSED, "Exit"}:
             break
 
+        if event == sg.TIMEOUT_EVENT:
+            window["-GENERATION_PROGRESS-"].update(next(spinner))
+            window["-GENERATION_STATUS-"].update(generation.status())
+            continue
+
         if event == "Save User Info":
             save_user(values)
             window["-PROFILE_DROPDOWN-"].update(values=get_user_profiles())
@@ -164,18 +293,40 @@ def open_gui():
                 window["-CLASSES-"].update(user_info[6] if user_info[6] else "")
                 window["-OTHER-"].update(user_info[7] if user_info[7] else "")
 
+        # Search jobs (or show them all again for an empty search), rank them and change pages
+        if event in ("-SEARCH_BUTTON-", "-RANK_JOBS-", "-PREV_PAGE-", "-NEXT_PAGE-"):
+            if event == "-RANK_JOBS-":
+                if not values["-PROFILE_DROPDOWN-"]:
+                    sg.popup("Please select a user.", title="Error")
+                    continue
+                from job_ranking import update_index  # pylint: disable=import-outside-toplevel
+                update_index(DB_NAME)  # Index jobs imported since the last ranking
+                pager.rank(load_user_profile(values["-PROFILE_DROPDOWN-"]))
+            elif event == "-SEARCH_BUTTON-":
+                pager.search(values["-SEARCH-"],
+                             {"min_salary": parse_amount(values["-MIN_SALARY-"]),
+                              "max_salary": parse_amount(values["-MAX_SALARY-"])})
+            elif event == "-PREV_PAGE-":
+                pager.previous_page()
+            else:
+                pager.next_page()
+            window["-JOB_TABLE-"].update(values=pager.table_values())
+            window["-PAGE-"].update(f"Page {pager.page}")
+
         # Fill in Job Details when a job is selected
         if event == "-JOB_TABLE-":
             if values["-JOB_TABLE-"]:
                 selected_index = values["-JOB_TABLE-"][0]
-                job_id = job_data[selected_index][0]
+                job_id = pager.job_id(selected_index)
                 job_details = get_job_info(job_id)
                 if job_details:
                     details_text = (
                         f"ID: {job_details[0]}\n"
                         f"Title: {job_details[1]}\n"
                         f"Company: {job_details[2]}\n"
-                        f"Location: {job_details[3]}\n\n"
+                        f"Location: {job_details[3]}\n"
+                        f"Salary: {format_salary(job_details[6], job_details[7], job_details[8])}"
+                        f"\n\n"
                         f"Description:\n{job_details[10]}"
                     )
                     window["-JOB_DETAILS-"].update(details_text)
@@ -194,18 +345,41 @@ def open_gui():
                 sg.popup("Please select a job.", title="Error")
                 continue
 
-            job_details = get_job_info(job_data[selected_job[0]][0])
-
-            pdf_path = generate_resume_and_cover_letter(user_data, {
-                "title": job_details[1],
-                "company": job_details[2],
-                "location": job_details[3],
-                "description": job_details[10]
-            }, "resume" if event == "-GENERATE_RESUME-" else "cover_letter")
+            job_data = get_job_for_generation(pager.job_id(selected_job[0]))
+            if job_data is None:  # Removed by a re-import since the table was loaded
+                sg.popup("That job is no longer in the database.", title="Error")
+                continue
 
-            sg.popup(f"PDF generated: {pdf_path}", title="Success")
+            doc_type = "resume" if event == "-GENERATE_RESUME-" else "cover_letter"
+            generation.submit(f"{doc_type.replace('_', ' ')} for {job_data['title']}",
+                              user_data, job_data, doc_type,
+                              regenerate=values["-REGENERATE-"],
+                              output_path=job_output_path(user_data[1], job_data["id"], doc_type))
+            window["-GENERATION_STATUS-"].update(generation.status())
+
+        if event == "-CANCEL_GENERATION-":
+            generation.cancel_all()
+            window["-GENERATION_STATUS-"].update(generation.status())
+
+        # Show the markdown of the document being generated as it streams in
+        if event == GENERATION_PREVIEW:
+            ticket, markdown_so_far = values[GENERATION_PREVIEW]
+            if ticket in generation.tasks:
+                window["-PREVIEW-"].update(markdown_so_far)
+
+        if event == GENERATION_DONE:
+            description, pdf_path, error = generation.collect(values[GENERATION_DONE])
+            window["-GENERATION_STATUS-"].update(generation.status())
+            if not generation.tasks:
+                window["-GENERATION_PROGRESS-"].update(0)
+            if error:
+                sg.popup(f"Could not generate {description}: {error}", title="Error",
+                         non_blocking=True)
+            elif pdf_path:
+                sg.popup(f"PDF generated: {pdf_path}", title="Success", non_blocking=True)
 
     # Close the window
+    generation.shutdown()
     window.close()
 
 